@@ -1,5 +1,6 @@
 import os
 import logging
+import secrets
 import sys
 from dotenv import load_dotenv
 
@@ -81,11 +82,43 @@ logger.error("Error logging enabled")
 sys.stdout.flush()
 sys.stderr.flush()
 
-from telegram.ext import Application, MessageHandler, CallbackQueryHandler, filters
+from telegram import Update
+from telegram.ext import Application, MessageHandler, CallbackQueryHandler, ContextTypes, InlineQueryHandler, filters
 
 # Import modules
 from modules.handlers.core.conversation import create_conversation_handler
 from modules import localization  # noqa: F401 - ensure localization patches are loaded
+from modules.api.client import init_client, close_client
+from modules.api.health import start_health_monitor
+from modules.api.user_mirror import restore_user_mirror, start_user_mirror
+from modules.api.snapshot import snapshot_store
+from modules.handlers.bulk.jobs import BULK_CANCEL_CALLBACK, handle_bulk_cancel
+from modules.handlers.users.inline import handle_inline_query
+from modules.handlers.core.start import start_dashboard_refresh
+from modules.api.topology import start_topology_refresh
+from modules.config import (
+    BOT_MODE, DROP_PENDING_UPDATES, UPDATE_CONCURRENCY, WEBHOOK_LISTEN, WEBHOOK_PATH, WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN, WEBHOOK_URL
+)
+from modules.utils.update_processor import PerChatUpdateProcessor
+from modules.utils.outbound import OutboundRateLimiter
+from modules.utils.persistence import UserData, create_persistence
+
+
+async def post_init(application: Application):
+    """Open shared resources once the application is initialized"""
+    await init_client()
+    start_health_monitor(application)
+    await restore_user_mirror()
+    start_user_mirror(application)
+    start_dashboard_refresh(application)
+    start_topology_refresh(application)
+
+
+async def post_shutdown(application: Application):
+    """Release shared resources when the application stops"""
+    await snapshot_store.close()
+    await close_client()
 
 
 def main():
@@ -122,7 +155,21 @@ def main():
         return
     # Create the Application
     logger.info("Creating Telegram Application...")
-    application = Application.builder().token(bot_token).build()
+    builder = (
+        Application.builder()
+        .token(bot_token)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(PerChatUpdateProcessor(UPDATE_CONCURRENCY))
+        .rate_limiter(OutboundRateLimiter())
+        .context_types(ContextTypes(user_data=UserData))
+    )
+    persistence = create_persistence()
+    if persistence is not None:
+        # Состояние диалогов и данные мастеров переживают перезапуск
+        builder = builder.persistence(persistence)
+        logger.info(f"Conversation state persistence enabled: {persistence.path}")
+    application = builder.build()
     logger.info("Telegram Application created successfully")
     
     # Cache cleanup will be handled automatically by the cache TTL mechanism
@@ -130,50 +177,63 @@ def main():
     
     # Create and add conversation handler
     logger.info("Creating conversation handler...")
-    conv_handler = create_conversation_handler()
+    conv_handler = create_conversation_handler(persistent=persistence is not None)
     application.add_handler(conv_handler, group=0)
+    # Отмена массовой операции должна работать из любого состояния диалога
+    application.add_handler(
+        CallbackQueryHandler(handle_bulk_cancel, pattern=f"^{BULK_CANCEL_CALLBACK}$"), group=-1
+    )
+    # Inline-поиск пользователей: @bot <имя> в любом чате (включается в BotFather через /setinline)
+    application.add_handler(InlineQueryHandler(handle_inline_query))
     logger.info("Conversation handler added successfully")
     
-    # Run polling with retry logic
-    max_retries = 10
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            logger.info(f"Starting bot polling (attempt {retry_count + 1}/{max_retries})")
-            logger.info("Bot configuration:")
-            logger.info(f"  - Poll interval: 0.5s")
-            logger.info(f"  - Timeout: 30s")
-            logger.info(f"  - Bootstrap retries: 5")
-            logger.info(f"  - Drop pending updates: True")
-            
-            # Run polling - production configuration
-            application.run_polling(
-                poll_interval=0.5,
-                timeout=30,
-                bootstrap_retries=5,
-                read_timeout=30,
-                write_timeout=30,
-                connect_timeout=30,
-                pool_timeout=30,
-                drop_pending_updates=True
-            )
-            logger.info("Bot polling started successfully")
-            break  # If successful, exit the retry loop
-        except Exception as e:
-            retry_count += 1
-            logger.error(f"Error during polling (attempt {retry_count}/{max_retries}): {e}")
-            logger.error(f"Exception type: {type(e).__name__}")
-            
-            if retry_count >= max_retries:
-                logger.error(f"Max retries reached. Bot failed to start after {max_retries} attempts.")
-                raise
-            
-            # Wait before retrying
-            import time
-            wait_time = min(30 * retry_count, 300)  # Exponential backoff, max 5 minutes
-            logger.info(f"Waiting {wait_time} seconds before retry...")
-            time.sleep(wait_time)
+    run_application(application)
+
+
+def run_application(application: Application):
+    """Serve updates via long polling or the built-in webhook server.
+
+    PTB owns the lifecycle: it retries bootstrap on network errors, keeps
+    reconnecting while running and calls post_shutdown on SIGINT/SIGTERM.
+    """
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            logger.error("BOT_MODE=webhook requires WEBHOOK_URL (public HTTPS address of the bot)")
+            return
+        secret_token = WEBHOOK_SECRET_TOKEN
+        if not secret_token:
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET_TOKEN не задан, используется случайный токен до перезапуска")
+        webhook_url = f"{WEBHOOK_URL}/{WEBHOOK_PATH}"
+        logger.info(
+            f"Starting webhook server on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH} "
+            f"(public URL {webhook_url}, drop pending updates: {DROP_PENDING_UPDATES})"
+        )
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            bootstrap_retries=-1,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=DROP_PENDING_UPDATES
+        )
+        return
+
+    if BOT_MODE != "polling":
+        logger.warning(f"Unknown BOT_MODE '{BOT_MODE}', falling back to polling")
+    logger.info(f"Starting bot polling (drop pending updates: {DROP_PENDING_UPDATES})")
+    application.run_polling(
+        timeout=30,
+        bootstrap_retries=-1,
+        read_timeout=30,
+        write_timeout=30,
+        connect_timeout=30,
+        pool_timeout=30,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=DROP_PENDING_UPDATES
+    )
 
 if __name__ == '__main__':
     try:
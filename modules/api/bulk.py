@@ -1,4 +1,12 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
 from modules.api.client import RemnaAPI
+from modules.api.user_mirror import user_mirror
+from modules.config import BULK_CHUNK_SIZE, BULK_CONCURRENCY, BULK_RETRIES
+
+logger = logging.getLogger(__name__)
 
 class BulkAPI:
     """API methods for bulk operations"""
@@ -7,25 +15,37 @@ class BulkAPI:
     async def bulk_delete_users_by_status(status):
         """Bulk delete users by status"""
         data = {"status": status}
-        return await RemnaAPI.post("users/bulk/delete-by-status", data)
+        result = await RemnaAPI.post("users/bulk/delete-by-status", data)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_delete_users(uuids):
         """Bulk delete users by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/delete", data)
+        result = await RemnaAPI.post("users/bulk/delete", data)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_revoke_users_subscription(uuids):
         """Bulk revoke users subscription by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/revoke-subscription", data)
+        result = await RemnaAPI.post("users/bulk/revoke-subscription", data)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_reset_user_traffic(uuids):
         """Bulk reset traffic for users by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("users/bulk/reset-traffic", data)
+        result = await RemnaAPI.post("users/bulk/reset-traffic", data)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_update_users(uuids, fields):
@@ -34,7 +54,10 @@ class BulkAPI:
             "uuids": uuids,
             "fields": fields
         }
-        return await RemnaAPI.post("users/bulk/update", data)
+        result = await RemnaAPI.post("users/bulk/update", data)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_update_users_inbounds(uuids, inbounds):
@@ -44,9 +67,113 @@ class BulkAPI:
     @staticmethod
     async def bulk_update_all_users(fields):
         """Bulk update all users"""
-        return await RemnaAPI.post("users/bulk/all/update", fields)
+        result = await RemnaAPI.post("users/bulk/all/update", fields)
+        if result:
+            user_mirror.request_sync()
+        return result
     
     @staticmethod
     async def bulk_reset_all_users_traffic():
         """Bulk reset all users traffic"""
-        return await RemnaAPI.post("users/bulk/all/reset-traffic")
+        result = await RemnaAPI.post("users/bulk/all/reset-traffic")
+        if result:
+            user_mirror.request_sync()
+        return result
+
+
+def affected_rows(result) -> Optional[int]:
+    """Row count reported by a bulk endpoint; None when the response carries none"""
+    if isinstance(result, dict):
+        for key in ("affectedRows", "deletedCount"):
+            value = result.get(key)
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+    return None
+
+
+async def execute_per_user(
+    uuids: List[str],
+    action: Callable[[str], Awaitable],
+    concurrency: Optional[int] = None,
+    retries: Optional[int] = None,
+    on_progress: Optional[Callable[[Dict[str, bool]], None]] = None,
+    cancel_event: Optional[asyncio.Event] = None
+) -> Dict[str, bool]:
+    """Run action(uuid) for every UUID with bounded concurrency and per-item retry.
+
+    Once cancel_event is set no new UUIDs are dispatched; skipped UUIDs are left out of the result.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or BULK_CONCURRENCY))
+    attempts = 1 + max(0, BULK_RETRIES if retries is None else retries)
+
+    async def run(uuid: str) -> Optional[bool]:
+        async with semaphore:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            success = False
+            for attempt in range(attempts):
+                try:
+                    if await action(uuid):
+                        success = True
+                        break
+                except Exception as e:
+                    logger.error(f"Bulk action failed for user {uuid} (attempt {attempt + 1}/{attempts}): {e}")
+                if attempt + 1 < attempts:
+                    await asyncio.sleep(0.5 * (attempt + 1))
+            if on_progress is not None:
+                on_progress({uuid: success})
+            return success
+
+    uuids = list(dict.fromkeys(uuids))
+    outcomes = await asyncio.gather(*(run(uuid) for uuid in uuids))
+    return {uuid: outcome for uuid, outcome in zip(uuids, outcomes) if outcome is not None}
+
+
+async def execute_chunked(
+    uuids: List[str],
+    bulk_action: Callable[[List[str]], Awaitable],
+    fallback: Optional[Callable[[str], Awaitable]] = None,
+    chunk_size: Optional[int] = None,
+    on_progress: Optional[Callable[[Dict[str, bool]], None]] = None,
+    cancel_event: Optional[asyncio.Event] = None
+) -> Dict[str, bool]:
+    """Send UUIDs to a native bulk endpoint in chunks; failed chunks go through fallback per user.
+
+    A chunk counts as done only if the panel reports at least len(chunk) affected rows (or, for
+    endpoints without a row count, returns a truthy result). On a partial count the panel does not
+    say which users were skipped, so the whole chunk is retried per user: fallback must be idempotent.
+    """
+    uuids = list(dict.fromkeys(uuids))
+    size = max(1, chunk_size or BULK_CHUNK_SIZE)
+    results: Dict[str, bool] = {}
+
+    for start in range(0, len(uuids), size):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        chunk = uuids[start:start + size]
+        try:
+            result = await bulk_action(chunk)
+        except Exception as e:
+            logger.error(f"Bulk request failed for {len(chunk)} users: {e}")
+            result = None
+        affected = affected_rows(result)
+        ok = bool(result) if affected is None else affected >= len(chunk)
+        if not ok and affected:
+            logger.warning(f"Bulk request affected only {affected} of {len(chunk)} users")
+
+        if ok:
+            chunk_results = dict.fromkeys(chunk, True)
+        elif fallback is not None:
+            logger.warning(f"Bulk request failed for {len(chunk)} users, falling back to per-user requests")
+            results.update(await execute_per_user(
+                chunk, fallback, on_progress=on_progress, cancel_event=cancel_event
+            ))
+            continue
+        else:
+            chunk_results = dict.fromkeys(chunk, False)
+
+        results.update(chunk_results)
+        if on_progress is not None:
+            on_progress(chunk_results)
+
+    return results
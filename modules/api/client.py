@@ -1,17 +1,43 @@
 import httpx
+import copy
 import logging
 import asyncio
-from modules.config import API_BASE_URL, API_TOKEN, API_COOKIES
+from typing import Dict, Optional, Tuple
+from modules.config import (
+    API_BASE_URL, API_TOKEN, API_COOKIES,
+    API_TIMEOUT, API_MAX_CONNECTIONS, API_MAX_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY,
+    API_PAGE_SIZE, API_PAGE_CONCURRENCY, API_PAGE_RETRIES
+)
+from modules.api.health import circuit_breaker, check_panel_health
 
 logger = logging.getLogger(__name__)
 
+# Общий для всего процесса клиент, создается при старте приложения
+_client: Optional[httpx.AsyncClient] = None
+
+
+class _InflightGet:
+    """A GET shared by identical callers, with the number of callers still waiting for it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+# Больше элементов на страницу панель не отдает, сколько бы ни запросили
+PANEL_MAX_PAGE_SIZE = 500
+
+# Выполняющиеся GET-запросы: одинаковые вызовы ждут один и тот же запрос (singleflight)
+_inflight_gets: Dict[Tuple, _InflightGet] = {}
+
 def get_headers():
     """Get headers for API requests"""
     headers = {
         "Content-Type": "application/json",
         "Accept": "application/json",
-        "User-Agent": "RemnaBot/1.0",
-        "Connection": "close"
+        "User-Agent": "RemnaBot/1.0"
     }
     if API_TOKEN:
         headers["Authorization"] = f"Bearer {API_TOKEN}"
@@ -20,20 +46,21 @@ def get_headers():
 def get_client_kwargs():
     """Get httpx client configuration"""
     client_kwargs = {
-        "timeout": 30.0,  # Reduced timeout for faster failure detection
+        "timeout": API_TIMEOUT,
         "verify": True,  # Enable SSL verification for HTTPS
         "headers": get_headers(),
-        # More conservative connection limits to prevent exhaustion
+        # Keep-alive pool shared by all requests to the panel
         "limits": httpx.Limits(
-            max_keepalive_connections=2, 
-            max_connections=5, 
-            keepalive_expiry=10  # Shorter keepalive to prevent stale connections
+            max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+            max_connections=API_MAX_CONNECTIONS,
+            keepalive_expiry=API_KEEPALIVE_EXPIRY
         ),
         # Force HTTP/1.1 for better compatibility
         "http2": False,
         # SSL configuration for HTTPS
         "cert": None,  # No client certificate
-        "trust_env": False  # Don't use environment variables for proxy settings
+        "trust_env": False,  # Don't use environment variables for proxy settings
+        "follow_redirects": True
     }
 
 
@@ -43,25 +70,36 @@ def get_client_kwargs():
 
     return client_kwargs
 
+async def init_client() -> httpx.AsyncClient:
+    """Create the shared HTTP client (called from Application.post_init)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(**get_client_kwargs())
+        logger.info(
+            "HTTP client initialized: max_connections=%s, max_keepalive=%s, keepalive_expiry=%ss",
+            API_MAX_CONNECTIONS, API_MAX_KEEPALIVE_CONNECTIONS, API_KEEPALIVE_EXPIRY
+        )
+    return _client
+
+async def close_client():
+    """Close the shared HTTP client (called from Application.post_shutdown)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("HTTP client closed")
+    _client = None
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it lazily if the app did not"""
+    global _client
+    if _client is None or _client.is_closed:
+        logger.debug("Shared HTTP client is not initialized, creating it lazily")
+        _client = httpx.AsyncClient(**get_client_kwargs())
+    return _client
+
 class RemnaAPI:
     """API client for Remnawave API using httpx"""
     
-    @staticmethod
-    async def _test_connection():
-        """Test basic connectivity to the API server"""
-        try:
-            # Используем известный рабочий эндпоинт для проверки подключения
-            url = f"{API_BASE_URL.rstrip('/')}/users"
-            client_kwargs = get_client_kwargs()
-            
-            async with httpx.AsyncClient(**client_kwargs) as client:
-                response = await client.get(url, timeout=10.0, follow_redirects=True)
-                logger.debug(f"Тест подключения: статус {response.status_code}, URL: {response.url}")
-                return response.status_code == 200
-        except Exception as e:
-            logger.debug(f"Тест подключения не прошел: {e}")
-            return False
-    
     @staticmethod
     async def _make_request(method, endpoint, data=None, params=None, retry_count=3):
         """Make HTTP request with retry logic and proper error handling"""
@@ -72,73 +110,71 @@ class RemnaAPI:
         logger.debug(f"Request data: {data}")
         
         for attempt in range(retry_count):
+            # Панель недоступна по данным health monitor — не ждем таймаутов
+            if not circuit_breaker.allow_request():
+                logger.warning(f"Панель недоступна (circuit {circuit_breaker.state}), запрос {method} {endpoint} пропущен")
+                return None
+
             try:
-                # Test connection on first attempt or after failures
-                if attempt == 0 or attempt > 0:
-                    if not await RemnaAPI._test_connection():
-                        logger.warning(f"Тест подключения не прошел на попытке {attempt + 1}")
-                        if attempt < retry_count - 1:
-                            wait_time = 2 ** attempt
-                            logger.info(f"Ожидание {wait_time} секунд перед повторной попыткой...")
-                            await asyncio.sleep(wait_time)
-                            continue
-                        else:
-                            logger.error("Тест подключения не прошел на финальной попытке")
-                            return None
+                client = get_client()
+                request_kwargs = {
+                    'url': url,
+                    'params': params
+                }
                 
-                client_kwargs = get_client_kwargs()
-                logger.debug(f"Client config: {client_kwargs}")
+                if method.upper() in ['POST', 'PATCH', 'PUT'] and data is not None:
+                    request_kwargs['json'] = data
                 
-                async with httpx.AsyncClient(**client_kwargs) as client:
-                    request_kwargs = {
-                        'url': url,
-                        'params': params
-                    }
-                    
-                    if method.upper() in ['POST', 'PATCH', 'PUT'] and data is not None:
-                        request_kwargs['json'] = data
-                    
-                    response = await client.request(method, follow_redirects=True, **request_kwargs)
-                    
-                    logger.debug(f"Response status: {response.status_code}")
-                    logger.debug(f"Response headers: {dict(response.headers)}")
-                    
-                    # Проверка статуса ответа
-                    if response.status_code >= 500:
-                        logger.warning(f"Ошибка сервера {response.status_code}, повторная попытка...")
-                        if attempt < retry_count - 1:
-                            await asyncio.sleep(2 ** attempt)
-                            continue
-                    
-                    response.raise_for_status()
-                    
-                    # Проверка Content-Type
-                    content_type = response.headers.get('content-type', '')
-                    if 'application/json' not in content_type.lower():
-                        logger.error(f"Ожидался JSON, получен {content_type}. Ответ: {response.text[:500]}")
-                        return None
-                    
-                    # Парсинг JSON
-                    if not response.text.strip():
-                        logger.warning("Получен пустой ответ")
+                response = await client.request(method, **request_kwargs)
+                # Как и health check: успех — только 2xx; 401/403 (неверный токен) и 5xx — сбой,
+                # прочие 4xx (нет объекта, неверные данные) о доступности панели ничего не говорят
+                if response.is_success:
+                    circuit_breaker.record_success()
+                elif response.status_code >= 500 or response.status_code in (401, 403):
+                    circuit_breaker.record_failure(f"HTTP {response.status_code}")
+                else:
+                    circuit_breaker.record_inconclusive()
+                
+                logger.debug(f"Response status: {response.status_code}")
+                logger.debug(f"Response headers: {dict(response.headers)}")
+                
+                # Проверка статуса ответа
+                if response.status_code >= 500:
+                    logger.warning(f"Ошибка сервера {response.status_code}, повторная попытка...")
+                    if attempt < retry_count - 1:
+                        await asyncio.sleep(2 ** attempt)
+                        continue
+                
+                response.raise_for_status()
+                
+                # Проверка Content-Type
+                content_type = response.headers.get('content-type', '')
+                if 'application/json' not in content_type.lower():
+                    logger.error(f"Ожидался JSON, получен {content_type}. Ответ: {response.text[:500]}")
+                    return None
+                
+                # Парсинг JSON
+                if not response.text.strip():
+                    logger.warning("Получен пустой ответ")
+                    return None
+                
+                json_response = response.json()
+                
+                # Обработка структуры ответа Remnawave API
+                if isinstance(json_response, dict):
+                    if 'response' in json_response:
+                        return json_response['response']
+                    elif 'error' in json_response:
+                        logger.error(f"API вернул ошибку: {json_response['error']}")
                         return None
-                    
-                    json_response = response.json()
-                    
-                    # Обработка структуры ответа Remnawave API
-                    if isinstance(json_response, dict):
-                        if 'response' in json_response:
-                            return json_response['response']
-                        elif 'error' in json_response:
-                            logger.error(f"API вернул ошибку: {json_response['error']}")
-                            return None
-                        else:
-                            return json_response
-                    
-                    return json_response
+                    else:
+                        return json_response
+                
+                return json_response
                         
             except httpx.ConnectError as e:
                 logger.error(f"Ошибка подключения на попытке {attempt + 1}: {str(e)}")
+                circuit_breaker.record_failure("ConnectError")
                 if attempt < retry_count - 1:
                     wait_time = 2 ** attempt
                     logger.info(f"Повторная попытка через {wait_time} секунд...")
@@ -149,6 +185,7 @@ class RemnaAPI:
                     
             except httpx.TimeoutException as e:
                 logger.error(f"Превышено время ожидания на попытке {attempt + 1}: {str(e)}")
+                circuit_breaker.record_failure("TimeoutException")
                 if attempt < retry_count - 1:
                     wait_time = min(2 ** attempt, 10)
                     logger.info(f"Повторная попытка через {wait_time} секунд...")
@@ -172,6 +209,7 @@ class RemnaAPI:
                     
             except httpx.RemoteProtocolError as e:
                 logger.error(f"Ошибка протокола на попытке {attempt + 1}: {str(e)}")
+                circuit_breaker.record_failure("RemoteProtocolError")
                 if attempt < retry_count - 1:
                     wait_time = 2 ** attempt
                     logger.info(f"Ошибка протокола, повторная попытка через {wait_time} секунд...")
@@ -202,6 +240,7 @@ class RemnaAPI:
                     
             except Exception as e:
                 logger.error(f"Неожиданная ошибка на попытке {attempt + 1}: {str(e)}")
+                circuit_breaker.record_failure(type(e).__name__)
                 logger.debug(f"Тип исключения: {type(e).__name__}")
                 if attempt < retry_count - 1:
                     wait_time = 2 ** attempt
@@ -213,10 +252,133 @@ class RemnaAPI:
         
         return None
     
+    @staticmethod
+    def _request_key(endpoint, params=None) -> Tuple:
+        """Build a hashable key from endpoint and query params"""
+        items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return endpoint.strip('/'), items
+    
     @staticmethod
     async def get(endpoint, params=None):
-        """Make a GET request to the API"""
-        return await RemnaAPI._make_request('GET', endpoint, params=params)
+        """Make a GET request to the API, sharing one in-flight request between identical calls.
+
+        Each caller gets its own copy of the result, since handlers sort lists and pop keys in
+        what they receive. The last caller to resume takes the original, so a request nobody
+        joined is not copied at all.
+        """
+        key = RemnaAPI._request_key(endpoint, params)
+        inflight = _inflight_gets.get(key)
+        if inflight is None:
+            inflight = _InflightGet(asyncio.ensure_future(RemnaAPI._make_request('GET', endpoint, params=params)))
+            _inflight_gets[key] = inflight
+            
+            # Выполняется раньше, чем проснется первый ожидающий: к готовому результату уже никто не присоединится
+            def _forget(done, key=key, inflight=inflight):
+                if _inflight_gets.get(key) is inflight:
+                    del _inflight_gets[key]
+            
+            inflight.task.add_done_callback(_forget)
+        else:
+            logger.debug(f"Joining in-flight GET {endpoint} {params}")
+        inflight.waiters += 1
+        try:
+            # shield: отмена одного ожидающего не прерывает запрос для остальных
+            result = await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+        return result if inflight.waiters == 0 else copy.deepcopy(result)
+    
+    @staticmethod
+    def _extract_page_items(response, items_key):
+        """Return the list of items from a paginated response, or None if it is malformed"""
+        if isinstance(response, dict):
+            items = response.get(items_key)
+            if items is None and isinstance(response.get('response'), dict):
+                items = response['response'].get(items_key)
+            return items if isinstance(items, list) else None
+        if isinstance(response, list):
+            return response
+        return None
+    
+    @staticmethod
+    async def get_paginated(endpoint, items_key, page_size=None, concurrency=None, page_retries=None, params=None, strict=False):
+        """Fetch every page of a start/size paginated endpoint.
+        
+        The first page is used to read ``total``; the remaining pages are requested
+        concurrently (bounded by ``concurrency``), retried one by one on failure and
+        reassembled in their original order. With ``strict=True`` None is returned
+        unless every page was fetched and ``total`` items arrived, so callers can tell
+        a partial scan apart.
+        """
+        page_size = max(1, min(page_size or API_PAGE_SIZE, PANEL_MAX_PAGE_SIZE))
+        concurrency = max(1, concurrency or API_PAGE_CONCURRENCY)
+        page_retries = API_PAGE_RETRIES if page_retries is None else page_retries
+        
+        async def fetch_page(start):
+            page_params = dict(params or {}, start=start, size=page_size)
+            for attempt in range(page_retries + 1):
+                response = await RemnaAPI.get(endpoint, params=page_params)
+                items = RemnaAPI._extract_page_items(response, items_key)
+                if items is not None:
+                    return response, items
+                logger.warning(f"Страница {endpoint} (start={start}) не получена, попытка {attempt + 1}/{page_retries + 1}")
+            return None, None
+        
+        first_response, first_items = await fetch_page(0)
+        if first_items is None:
+            return None if strict else []
+        
+        total = None
+        if isinstance(first_response, dict):
+            total = first_response.get('total')
+            if total is None and isinstance(first_response.get('response'), dict):
+                total = first_response['response'].get('total')
+        
+        if not isinstance(total, (int, float)):
+            # Панель не вернула total — идем по страницам последовательно
+            items = list(first_items)
+            start = page_size
+            last_page = first_items
+            while len(last_page) >= page_size:
+                _, last_page = await fetch_page(start)
+                if last_page is None and strict:
+                    return None
+                if not last_page:
+                    break
+                items.extend(last_page)
+                start += page_size
+            return items
+        
+        if 0 < len(first_items) < min(page_size, int(total)):
+            # Панель урезала страницу: шагаем по фактическому размеру, иначе между страницами будут пропуски
+            logger.warning(f"{endpoint}: панель вернула {len(first_items)} элементов вместо {page_size}, уменьшаем страницу")
+            page_size = len(first_items)
+        
+        starts = list(range(page_size, int(total), page_size))
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def fetch_limited(start):
+            async with semaphore:
+                _, items = await fetch_page(start)
+                return items
+        
+        pages = await asyncio.gather(*(fetch_limited(start) for start in starts))
+        
+        items = list(first_items)
+        for start, page in zip(starts, pages):
+            if page is None:
+                logger.error(f"Страница {endpoint} (start={start}, size={page_size}) пропущена после {page_retries + 1} попыток")
+                if strict:
+                    return None
+                continue
+            items.extend(page)
+        
+        logger.info(f"Fetched {len(items)}/{int(total)} items from {endpoint} in {len(starts) + 1} pages")
+        if strict and len(items) < int(total):
+            # Например, пользователей удалили во время обхода и страницы сдвинулись
+            logger.error(f"Неполный обход {endpoint}: {len(items)} из {int(total)}")
+            return None
+        return items
     
     @staticmethod
     async def post(endpoint, data=None):
@@ -235,5 +397,5 @@ class RemnaAPI:
     
     @staticmethod
     async def health_check():
-        """Check API server health"""
-        return await RemnaAPI._test_connection()
+        """Check API server health via system/health"""
+        return await check_panel_health()
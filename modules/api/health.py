@@ -0,0 +1,129 @@
+"""
+Фоновый мониторинг доступности панели и circuit breaker для RemnaAPI
+"""
+import logging
+import time
+from typing import Optional
+
+from modules.config import (
+    API_BASE_URL, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_TIMEOUT, HEALTH_CHECK_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+HEALTH_JOB_NAME = "panel_health_monitor"
+
+
+class CircuitBreaker:
+    """Circuit breaker: closed -> open after repeated failures -> half-open after a cooldown.
+
+    In half-open state a single probe request goes to the panel; everything else is rejected
+    until that probe succeeds or fails (or hangs longer than recovery_timeout).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_check_at: Optional[float] = None
+        # Когда пропущен пробный запрос в состоянии half-open (None — проба не выполняется)
+        self.probe_started_at: Optional[float] = None
+
+    @property
+    def is_available(self) -> bool:
+        return self.state == self.CLOSED
+
+    def allow_request(self) -> bool:
+        """Return False while the panel is known to be down or a recovery probe is in flight"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if self.opened_at is None or now - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            logger.info("Circuit breaker: half-open, пропускаем пробный запрос к панели")
+        elif self.state == self.CLOSED:
+            return True
+
+        # Проба, которая не вернула результат за recovery_timeout, считается потерянной
+        if self.probe_started_at is not None and now - self.probe_started_at < self.recovery_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Circuit breaker: closed, панель снова доступна")
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.probe_started_at = None
+
+    def record_failure(self, error: Optional[str] = None):
+        self.failures += 1
+        self.last_error = error
+        self.probe_started_at = None
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker: open после {self.failures} ошибок ({error})")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_inconclusive(self):
+        """A response that says nothing about availability (e.g. 404): only frees the probe slot"""
+        self.probe_started_at = None
+
+    def status_line(self) -> str:
+        """Human readable state for the dashboard"""
+        if self.state == self.CLOSED:
+            return "🟢 Панель: доступна"
+        if self.state == self.HALF_OPEN:
+            return "🟡 Панель: проверка восстановления"
+        if self.last_error:
+            return f"🔴 Панель: недоступна ({self.last_error})"
+        return "🔴 Панель: недоступна"
+
+
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_TIMEOUT)
+
+
+async def check_panel_health(context=None) -> bool:
+    """Poll system/health and feed the result into the circuit breaker (JobQueue callback)"""
+    from modules.api.client import get_client
+
+    url = f"{API_BASE_URL.rstrip('/')}/system/health"
+    circuit_breaker.last_check_at = time.time()
+    try:
+        response = await get_client().get(url, timeout=10.0)
+        # Только 2xx: 401/403/404 означают неверный токен или адрес, а не доступную панель
+        if response.is_success:
+            circuit_breaker.record_success()
+            logger.debug(f"Health check: статус {response.status_code}")
+            return True
+        circuit_breaker.record_failure(f"HTTP {response.status_code}")
+        logger.warning(f"Health check: панель ответила {response.status_code}")
+    except Exception as e:
+        circuit_breaker.record_failure(type(e).__name__)
+        logger.debug(f"Health check не прошел: {e}")
+    return False
+
+
+def start_health_monitor(application):
+    """Schedule periodic health checks on the application's JobQueue"""
+    if application.job_queue is None:
+        logger.warning("JobQueue недоступна, фоновая проверка панели отключена")
+        return
+    application.job_queue.run_repeating(
+        check_panel_health,
+        interval=HEALTH_CHECK_INTERVAL,
+        first=0,
+        name=HEALTH_JOB_NAME
+    )
+    logger.info(f"Health monitor started: interval={HEALTH_CHECK_INTERVAL}s")
@@ -1,12 +1,18 @@
 from modules.api.client import RemnaAPI
+from modules.api.snapshot import snapshot_store
+from modules.api.topology import topology_cache
 
 class HostAPI:
     """API methods for host management"""
     
     @staticmethod
     async def get_all_hosts():
-        """Get all hosts"""
-        return await RemnaAPI.get("hosts")
+        """Get all hosts (falls back to the snapshot when the panel is unreachable)"""
+        result = await RemnaAPI.get("hosts")
+        if result is None:
+            return await snapshot_store.load_response("hosts")
+        await snapshot_store.save_response("hosts", result)
+        return result
     
     @staticmethod
     async def get_tags():
@@ -21,7 +27,10 @@ class HostAPI:
     @staticmethod
     async def create_host(data):
         """Create a new host"""
-        return await RemnaAPI.post("hosts", data)
+        result = await RemnaAPI.post("hosts", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def update_host(uuid, data):
@@ -37,36 +46,54 @@ class HostAPI:
                 "configProfileUuid": data.pop("configProfileUuid", None),
                 "configProfileInboundUuid": inbound_uuid
             }
-        return await RemnaAPI.patch("hosts", data)
+        result = await RemnaAPI.patch("hosts", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def delete_host(uuid):
         """Delete a host"""
-        return await RemnaAPI.delete(f"hosts/{uuid}")
+        result = await RemnaAPI.delete(f"hosts/{uuid}")
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def enable_host(uuid):
         """Enable a host using PATCH"""
         data = {"uuid": uuid, "isDisabled": False}
-        return await RemnaAPI.patch("hosts", data)
+        result = await RemnaAPI.patch("hosts", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def disable_host(uuid):
         """Disable a host using PATCH"""
         data = {"uuid": uuid, "isDisabled": True}
-        return await RemnaAPI.patch("hosts", data)
+        result = await RemnaAPI.patch("hosts", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def bulk_enable_hosts(uuids):
         """Bulk enable hosts by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("hosts/bulk/enable", data)
+        result = await RemnaAPI.post("hosts/bulk/enable", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def bulk_disable_hosts(uuids):
         """Bulk disable hosts by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("hosts/bulk/disable", data)
+        result = await RemnaAPI.post("hosts/bulk/disable", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def reorder_hosts(hosts_data):
@@ -77,7 +104,10 @@ class HostAPI:
     async def bulk_delete_hosts(uuids):
         """Bulk delete hosts by UUIDs"""
         data = {"uuids": uuids}
-        return await RemnaAPI.post("hosts/bulk/delete", data)
+        result = await RemnaAPI.post("hosts/bulk/delete", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def bulk_set_inbound_to_hosts(uuids, inbound_uuid):
@@ -87,7 +117,10 @@ class HostAPI:
             "configProfileUuid": None,
             "configProfileInboundUuid": inbound_uuid
         }
-        return await RemnaAPI.post("hosts/bulk/set-inbound", data)
+        result = await RemnaAPI.post("hosts/bulk/set-inbound", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def bulk_set_port_to_hosts(uuids, port):
@@ -96,4 +129,7 @@ class HostAPI:
             "uuids": uuids,
             "port": port
         }
-        return await RemnaAPI.post("hosts/bulk/set-port", data)
+        result = await RemnaAPI.post("hosts/bulk/set-port", data)
+        if result:
+            topology_cache.invalidate()
+        return result
@@ -0,0 +1,221 @@
+"""
+Обратный индекс инбаунд -> пользователи по зеркалу пользователей и топологии панели
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from modules.api.squads import SquadAPI
+from modules.api.topology import topology_cache
+from modules.api.user_mirror import user_mirror
+from modules.api.user_record import UserRecord
+from modules.config import INBOUND_INDEX_TTL
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = {"ACTIVE", "ENABLED", "TRUE", "ON"}
+
+
+def _is_active(user: UserRecord) -> bool:
+    return str(user.get('status') or '').strip().upper() in ACTIVE_STATUSES
+
+
+def _ref_uuid(ref: Any) -> Optional[str]:
+    if isinstance(ref, str):
+        return ref
+    if isinstance(ref, dict) and ref.get('uuid'):
+        return str(ref['uuid'])
+    return None
+
+
+def _inbound_key(inbound: Dict[str, Any]) -> Optional[Tuple[str, int, str]]:
+    """tag + port + type: fallback identity for references without a UUID"""
+    port = inbound.get('port') if inbound.get('port') is not None else inbound.get('listenPort')
+    try:
+        if inbound.get('tag') and inbound.get('type') and port is not None:
+            return str(inbound['tag']), int(port), str(inbound['type'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _profile_uuid(item: Dict[str, Any]) -> Optional[str]:
+    profile = item.get('configProfile')
+    if isinstance(profile, dict):
+        profile = profile.get('uuid')
+    value = item.get('configProfileUuid') or profile
+    return str(value) if value else None
+
+
+class InboundMembershipIndex:
+    """Maps inbound UUIDs to member user UUIDs; topology is refreshed on a TTL, users incrementally"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._topology_at: Optional[float] = None
+        # Топология панели: какие инбаунды входят в сквады и профили
+        self._squad_inbounds: Dict[str, FrozenSet[str]] = {}
+        self._profile_inbounds: Dict[str, FrozenSet[str]] = {}
+        self._inbound_keys: Dict[Tuple[str, int, str], str] = {}
+        self._inbound_tags: Dict[str, str] = {}
+        # user uuid -> инбаунды пользователя и обратное отображение
+        self._user_inbounds: Dict[str, FrozenSet[str]] = {}
+        self._members: Dict[str, Set[str]] = {}
+        # Пользователи по тегу (нижний регистр) для эвристики, когда связей не нашлось
+        self._user_tags: Dict[str, str] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+
+    def _resolve_ref(self, ref: Any) -> Optional[str]:
+        uuid = _ref_uuid(ref)
+        if uuid is not None:
+            return uuid
+        if isinstance(ref, dict):
+            key = _inbound_key(ref)
+            if key is not None:
+                return self._inbound_keys.get(key)
+        return None
+
+    def _resolve_user(self, user: UserRecord) -> FrozenSet[str]:
+        inbounds: Set[str] = set()
+        for squad in user.get('activeInternalSquads') or []:
+            inbounds |= self._squad_inbounds.get(_ref_uuid(squad), frozenset())
+
+        subscriptions = [user.get('subscription')]
+        if isinstance(user.get('subscriptions'), list):
+            subscriptions.extend(user.get('subscriptions'))
+        profile_uuid = None
+        for item in subscriptions:
+            if not isinstance(item, dict):
+                continue
+            for ref in item.get('inbounds') or []:
+                inbounds.add(self._resolve_ref(ref))
+            profile_uuid = profile_uuid or _profile_uuid(item)
+        profile_uuid = profile_uuid or _profile_uuid(user)
+        if profile_uuid:
+            inbounds |= self._profile_inbounds.get(profile_uuid, frozenset())
+
+        for field in ('inbounds', 'activeInbounds'):
+            for ref in user.get(field) or []:
+                inbounds.add(self._resolve_ref(ref))
+        inbounds.discard(None)
+        return frozenset(inbounds)
+
+    def _drop(self, uuid: str):
+        for inbound_uuid in self._user_inbounds.pop(uuid, ()):
+            members = self._members.get(inbound_uuid)
+            if members is not None:
+                members.discard(uuid)
+                if not members:
+                    del self._members[inbound_uuid]
+        tag = self._user_tags.pop(uuid, None)
+        if tag is not None:
+            self._by_tag[tag].discard(uuid)
+            if not self._by_tag[tag]:
+                del self._by_tag[tag]
+
+    def apply(self, upserted: List[UserRecord], removed: List[str]):
+        """Mirror listener: re-resolve memberships of changed users"""
+        for uuid in removed:
+            self._drop(uuid)
+        for user in upserted:
+            self._drop(user.uuid)
+            inbounds = self._resolve_user(user)
+            if inbounds:
+                self._user_inbounds[user.uuid] = inbounds
+                for inbound_uuid in inbounds:
+                    self._members.setdefault(inbound_uuid, set()).add(user.uuid)
+            tag = str(user.get('tag') or '').strip().lower()
+            if tag:
+                self._user_tags[user.uuid] = tag
+                self._by_tag.setdefault(tag, set()).add(user.uuid)
+
+    async def _load_topology(self) -> bool:
+        await topology_cache.ensure_fresh()
+        squads = await SquadAPI.get_internal_squads()
+        inbounds = topology_cache.inbounds
+        if not inbounds:
+            logger.warning("Inbound index: inbounds are not available, keeping previous topology")
+            return False
+
+        squad_list = squads.get('internalSquads') if isinstance(squads, dict) else squads
+        squad_inbounds = {}
+        for squad in squad_list if isinstance(squad_list, list) else []:
+            if isinstance(squad, dict) and squad.get('uuid'):
+                refs = (_ref_uuid(ref) for ref in squad.get('inbounds') or [])
+                squad_inbounds[str(squad['uuid'])] = frozenset(ref for ref in refs if ref)
+
+        profile_inbounds = {}
+        for uuid, profile_refs in topology_cache.profile_inbounds.items():
+            refs = (_ref_uuid(ref) for ref in profile_refs)
+            profile_inbounds[uuid] = frozenset(ref for ref in refs if ref)
+
+        inbound_keys, inbound_tags = {}, {}
+        for inbound in inbounds:
+            if not isinstance(inbound, dict) or not inbound.get('uuid'):
+                continue
+            key = _inbound_key(inbound)
+            if key is not None:
+                inbound_keys[key] = str(inbound['uuid'])
+            if inbound.get('tag'):
+                inbound_tags[str(inbound['uuid'])] = str(inbound['tag']).strip().lower()
+
+        self._squad_inbounds = squad_inbounds
+        self._profile_inbounds = profile_inbounds
+        self._inbound_keys = inbound_keys
+        self._inbound_tags = inbound_tags
+        return True
+
+    async def refresh(self, force: bool = False):
+        """Reload topology when stale and re-resolve all mirrored users against it"""
+        async with self._lock:
+            fresh = self._topology_at is not None and time.monotonic() - self._topology_at < INBOUND_INDEX_TTL
+            if fresh and not force:
+                return
+            started = time.monotonic()
+            users = await user_mirror.get_users()
+            loaded = await self._load_topology()
+            if not loaded and self._topology_at is not None:
+                return
+            self._user_inbounds.clear()
+            self._members.clear()
+            self._user_tags.clear()
+            self._by_tag.clear()
+            self.apply(users, [])
+            # Без топологии индекс неполный: пробуем снова при следующем обращении
+            self._topology_at = time.monotonic() if loaded else None
+            logger.info(
+                f"Inbound index built: {len(self._members)} inbounds, {len(self._user_inbounds)} linked users "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+    def invalidate(self, _version: Optional[str] = None):
+        """Topology listener: rebuild on the next lookup"""
+        self._topology_at = None
+
+    def member_uuids(self, inbound_uuid: str) -> Set[str]:
+        """Users linked to the inbound; falls back to tag equality when nothing is linked"""
+        members = self._members.get(str(inbound_uuid))
+        if members:
+            return members
+        tag = self._inbound_tags.get(str(inbound_uuid))
+        return self._by_tag.get(tag, set()) if tag else set()
+
+    async def get_members(self, inbound_uuid: str) -> List[UserRecord]:
+        await self.refresh()
+        return user_mirror.lookup(self.member_uuids(inbound_uuid))
+
+    async def get_stats(self, inbound_uuids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """enabled/disabled/total member counts per inbound"""
+        await self.refresh()
+        result = {}
+        for inbound_uuid in inbound_uuids:
+            members = user_mirror.lookup(self.member_uuids(inbound_uuid))
+            enabled = sum(1 for user in members if _is_active(user))
+            result[inbound_uuid] = {'enabled': enabled, 'disabled': len(members) - enabled, 'total': len(members)}
+        return result
+
+
+inbound_index = InboundMembershipIndex()
+user_mirror.add_listener(inbound_index.apply)
+topology_cache.add_listener(inbound_index.invalidate)
@@ -1,4 +1,6 @@
 from modules.api.client import RemnaAPI
+from modules.api.snapshot import snapshot_store
+from modules.api.topology import topology_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,8 +10,12 @@ class NodeAPI:
     
     @staticmethod
     async def get_all_nodes():
-        """Get all nodes"""
-        return await RemnaAPI.get("nodes")
+        """Get all nodes (falls back to the snapshot when the panel is unreachable)"""
+        result = await RemnaAPI.get("nodes")
+        if result is None:
+            return await snapshot_store.load_response("nodes")
+        await snapshot_store.save_response("nodes", result)
+        return result
     
     @staticmethod
     async def get_node_by_uuid(uuid):
@@ -19,28 +25,43 @@ class NodeAPI:
     @staticmethod
     async def create_node(data):
         """Create a new node"""
-        return await RemnaAPI.post("nodes", data)
+        result = await RemnaAPI.post("nodes", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def update_node(uuid, data):
         """Update a node"""
         data["uuid"] = uuid
-        return await RemnaAPI.patch("nodes", data)
+        result = await RemnaAPI.patch("nodes", data)
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def delete_node(uuid):
         """Delete a node"""
-        return await RemnaAPI.delete(f"nodes/{uuid}")
+        result = await RemnaAPI.delete(f"nodes/{uuid}")
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def enable_node(uuid):
         """Enable a node (v208 actions endpoint)"""
-        return await RemnaAPI.post(f"nodes/{uuid}/actions/enable")
+        result = await RemnaAPI.post(f"nodes/{uuid}/actions/enable")
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def disable_node(uuid):
         """Disable a node (v208 actions endpoint)"""
-        return await RemnaAPI.post(f"nodes/{uuid}/actions/disable")
+        result = await RemnaAPI.post(f"nodes/{uuid}/actions/disable")
+        if result:
+            topology_cache.invalidate()
+        return result
     
     @staticmethod
     async def restart_node(uuid):
@@ -0,0 +1,224 @@
+"""
+Снимок данных панели в SQLite для быстрого старта после перезапуска
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from modules.api.user_record import UserRecord
+from modules.config import SNAPSHOT_PATH
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    uuid TEXT PRIMARY KEY,
+    username TEXT,
+    status TEXT,
+    expire_at TEXT,
+    tag TEXT,
+    telegram_id TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_status ON users(status);
+CREATE INDEX IF NOT EXISTS idx_users_expire_at ON users(expire_at);
+CREATE INDEX IF NOT EXISTS idx_users_tag ON users(tag);
+CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id);
+CREATE TABLE IF NOT EXISTS responses (
+    kind TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+
+def _user_row(user: UserRecord) -> tuple:
+    def text(key):
+        value = user.get(key)
+        return str(value) if value not in (None, '') else None
+
+    return (
+        user.uuid, text('username'), text('status'), text('expireAt'),
+        text('tag'), text('telegramId'), text('updatedAt'),
+        json.dumps(user.to_dict(), ensure_ascii=False)
+    )
+
+
+class SnapshotStore:
+    """Optional SQLite snapshot of users and list responses (nodes, hosts, inbounds, squads)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        # Изменения зеркала пользователей, ожидающие записи на диск
+        self._dirty: Dict[str, Optional[UserRecord]] = {}
+        # Хэш последнего записанного ответа по виду: одинаковые ответы не переписываем
+        self._response_digests: Dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        return conn
+
+    async def open(self) -> bool:
+        """Open the database if SNAPSHOT_PATH is configured"""
+        if not self.path or self._conn is not None:
+            return self.enabled
+        try:
+            self._conn = await self._run(self._open)
+            logger.info(f"Snapshot store opened: {self.path}")
+        except Exception as e:
+            logger.error(f"Error opening snapshot store {self.path}: {e}")
+            self._conn = None
+        return self.enabled
+
+    async def close(self):
+        if self._conn is None:
+            return
+        await self.flush_users()
+        conn, self._conn = self._conn, None
+        await self._run(conn.close)
+
+    def track_users(self, upserted: List[UserRecord], removed: List[str]):
+        """User mirror listener: remember changes until the next flush"""
+        for uuid in removed:
+            self._dirty[str(uuid)] = None
+        for user in upserted:
+            self._dirty[user.uuid] = user
+
+    def _write_users(self, changes: Dict[str, Optional[UserRecord]]):
+        rows = [_user_row(user) for user in changes.values() if user is not None]
+        deleted = [(uuid,) for uuid, user in changes.items() if user is None]
+        with self._conn:
+            if deleted:
+                self._conn.executemany("DELETE FROM users WHERE uuid = ?", deleted)
+            if rows:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO users "
+                    "(uuid, username, status, expire_at, tag, telegram_id, updated_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    async def flush_users(self):
+        """Write pending user changes in one transaction"""
+        if not self.enabled or not self._dirty:
+            return
+        changes, self._dirty = self._dirty, {}
+        try:
+            await self._run(self._write_users, changes)
+            logger.debug(f"Snapshot: saved {len(changes)} user changes")
+        except Exception as e:
+            logger.error(f"Error writing user snapshot: {e}")
+            # Вернем изменения в очередь, не затирая более свежие
+            changes.update(self._dirty)
+            self._dirty = changes
+
+    def _read_users(self) -> List[Dict[str, Any]]:
+        return [json.loads(row[0]) for row in self._conn.execute("SELECT data FROM users ORDER BY rowid")]
+
+    async def load_users(self) -> List[Dict[str, Any]]:
+        if not self.enabled:
+            return []
+        try:
+            return await self._run(self._read_users)
+        except Exception as e:
+            logger.error(f"Error reading user snapshot: {e}")
+            return []
+
+    def _query_users(self, sql: str, args: list) -> List[Dict[str, Any]]:
+        return [json.loads(row[0]) for row in self._conn.execute(sql, args)]
+
+    async def query_users(self, status: Optional[str] = None, tag: Optional[str] = None,
+                          telegram_id: Optional[Any] = None, expires_before: Optional[str] = None,
+                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Indexed lookup over the snapshot (expires_before is an ISO timestamp)"""
+        if not self.enabled:
+            return []
+        conditions, args = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            args.append(str(status))
+        if tag is not None:
+            conditions.append("tag = ?")
+            args.append(str(tag))
+        if telegram_id is not None:
+            conditions.append("telegram_id = ?")
+            args.append(str(telegram_id))
+        if expires_before is not None:
+            conditions.append("expire_at < ?")
+            args.append(str(expires_before))
+        sql = "SELECT data FROM users"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY username"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        try:
+            return await self._run(self._query_users, sql, args)
+        except Exception as e:
+            logger.error(f"Error querying user snapshot: {e}")
+            return []
+
+    def _write_response(self, kind: str, data: str):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (kind, data, saved_at) VALUES (?, ?, ?)",
+                (kind, data, time.time())
+            )
+
+    async def save_response(self, kind: str, response: Any):
+        """Store the latest successful list response for offline fallback"""
+        if not self.enabled or response is None:
+            return
+        data = json.dumps(response, ensure_ascii=False)
+        digest = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        if self._response_digests.get(kind) == digest:
+            return
+        try:
+            await self._run(self._write_response, kind, data)
+            self._response_digests[kind] = digest
+        except Exception as e:
+            logger.error(f"Error writing {kind} snapshot: {e}")
+
+    def _read_response(self, kind: str):
+        row = self._conn.execute("SELECT data, saved_at FROM responses WHERE kind = ?", (kind,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    async def load_response(self, kind: str) -> Any:
+        """Return the stored response for kind, or None"""
+        if not self.enabled:
+            return None
+        try:
+            data, saved_at = await self._run(self._read_response, kind)
+        except Exception as e:
+            logger.error(f"Error reading {kind} snapshot: {e}")
+            return None
+        if data is not None:
+            logger.warning(f"Panel unavailable, serving {kind} from snapshot saved {time.time() - saved_at:.0f}s ago")
+        return data
+
+
+snapshot_store = SnapshotStore(SNAPSHOT_PATH)
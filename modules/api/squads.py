@@ -1,6 +1,8 @@
 import logging
 from typing import Any, Dict, List, Optional
 from modules.api.client import RemnaAPI
+from modules.api.user_mirror import user_mirror
+from modules.api.snapshot import snapshot_store
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +13,13 @@ class SquadAPI:
     @staticmethod
     async def get_internal_squads(params: Optional[Dict[str, Any]] = None):
         """Fetch internal squads"""
-        return await RemnaAPI.get("internal-squads", params=params or {})
+        result = await RemnaAPI.get("internal-squads", params=params or {})
+        if params:
+            return result
+        if result is None:
+            return await snapshot_store.load_response("internal_squads")
+        await snapshot_store.save_response("internal_squads", result)
+        return result
 
     @staticmethod
     async def get_external_squads(params: Optional[Dict[str, Any]] = None):
@@ -22,13 +30,19 @@ class SquadAPI:
     async def add_users_to_internal_squad(squad_uuid: str, user_uuids: List[str]):
         """Add users to an internal squad"""
         payload = {"uuids": user_uuids}
-        return await RemnaAPI.post(f"internal-squads/{squad_uuid}/bulk-actions/add-users", payload)
+        result = await RemnaAPI.post(f"internal-squads/{squad_uuid}/bulk-actions/add-users", payload)
+        if result:
+            user_mirror.request_sync()
+        return result
 
     @staticmethod
     async def add_users_to_external_squad(squad_uuid: str, user_uuids: List[str]):
         """Add users to an external squad"""
         payload = {"uuids": user_uuids}
-        return await RemnaAPI.post(f"external-squads/{squad_uuid}/bulk-actions/add-users", payload)
+        result = await RemnaAPI.post(f"external-squads/{squad_uuid}/bulk-actions/add-users", payload)
+        if result:
+            user_mirror.request_sync()
+        return result
 
     @staticmethod
     async def bulk_update_internal_squads(user_uuids: List[str], internal_squad_uuids: List[str]):
@@ -37,4 +51,7 @@ class SquadAPI:
             "uuids": user_uuids,
             "activeInternalSquads": internal_squad_uuids
         }
-        return await RemnaAPI.post("users/bulk/update-squads", payload)
+        result = await RemnaAPI.post("users/bulk/update-squads", payload)
+        if result:
+            user_mirror.request_sync()
+        return result
@@ -0,0 +1,78 @@
+"""
+Агрегированная статистика пользователей: сначала system/stats панели, затем локальное зеркало
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from modules.api.system import SystemAPI
+from modules.api.user_mirror import user_mirror
+
+logger = logging.getLogger(__name__)
+
+USER_STATUSES = ('ACTIVE', 'DISABLED', 'LIMITED', 'EXPIRED')
+
+# Счетчики источников статистики: как часто приходится считать по зеркалу
+stats_metrics: Dict[str, int] = {'panel': 0, 'mirror_fallback': 0}
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _from_panel(stats: Any) -> Optional[Dict[str, Any]]:
+    users = stats.get('users') if isinstance(stats, dict) else None
+    if not isinstance(users, dict) or 'totalUsers' not in users:
+        return None
+
+    status_counts = dict.fromkeys(USER_STATUSES, 0)
+    for status, count in (users.get('statusCounts') or {}).items():
+        status_counts[status] = _to_int(count)
+
+    online = stats.get('onlineStats') or {}
+    return {
+        'count': _to_int(users.get('totalUsers')),
+        'stats': status_counts,
+        'total_traffic': _to_int(users.get('totalTrafficBytes')),
+        'online_now': _to_int(online.get('onlineNow')) if 'onlineNow' in online else None,
+        'source': 'panel',
+    }
+
+
+async def _from_mirror() -> Dict[str, Any]:
+    users = await user_mirror.get_users()
+    status_counts = dict.fromkeys(USER_STATUSES, 0)
+    total_traffic = 0
+    for user in users:
+        status = user.get('status', 'UNKNOWN')
+        if status in status_counts:
+            status_counts[status] += 1
+        total_traffic += _to_int(user.get('usedTrafficBytes'))
+    return {
+        'count': len(users),
+        'stats': status_counts,
+        'total_traffic': total_traffic,
+        'online_now': None,
+        'source': 'mirror',
+    }
+
+
+async def get_user_totals() -> Dict[str, Any]:
+    """User count, status counts and traffic total; server-side aggregates preferred"""
+    reason = "no users block in system/stats"
+    try:
+        totals = _from_panel(await SystemAPI.get_stats())
+        if totals is not None:
+            stats_metrics['panel'] += 1
+            return totals
+    except Exception as e:
+        reason = f"error: {e}"
+
+    stats_metrics['mirror_fallback'] += 1
+    logger.warning(
+        f"User stats fallback to local mirror ({reason}); "
+        f"fallbacks={stats_metrics['mirror_fallback']} panel={stats_metrics['panel']}"
+    )
+    return await _from_mirror()
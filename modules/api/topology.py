@@ -0,0 +1,190 @@
+"""
+Кэш топологии панели: профили конфигурации -> инбаунды -> хосты -> ноды
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from modules.api.config_profiles import ConfigProfileAPI
+from modules.config import TOPOLOGY_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGY_JOB_NAME = "topology_refresh"
+
+# Поля, изменение которых считается изменением топологии (счетчики трафика и онлайн не учитываются)
+_VERSION_FIELDS = {
+    'profiles': ('uuid', 'name'),
+    'inbounds': ('uuid', 'tag', 'type', 'port', 'profileUuid'),
+    'hosts': ('uuid', 'remark', 'address', 'port', 'inbound', 'isDisabled'),
+    'nodes': ('uuid', 'name', 'address', 'port', 'configProfile', 'isDisabled'),
+}
+
+
+def _items(result: Any, key: str) -> List[Dict[str, Any]]:
+    if isinstance(result, dict):
+        result = result.get(key)
+    return [item for item in result if isinstance(item, dict)] if isinstance(result, list) else []
+
+
+class TopologyCache:
+    """Profiles, their inbounds, hosts and nodes as one graph, versioned by a content hash"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.profiles: List[Dict[str, Any]] = []
+        self.inbounds: List[Dict[str, Any]] = []
+        self.profile_inbounds: Dict[str, List[Dict[str, Any]]] = {}
+        self.hosts: List[Dict[str, Any]] = []
+        self.nodes: List[Dict[str, Any]] = []
+        self.version: Optional[str] = None
+        self.refreshed_at: Optional[float] = None
+        self._stale = True
+        self._refresh_task: Optional[asyncio.Future] = None
+        # Изменение пришло во время фонового обновления: оно могло загрузить данные до записи
+        self._refresh_again = False
+        # Подписчики на смену версии, например индекс инбаунд -> пользователи
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+    @property
+    def is_fresh(self) -> bool:
+        return (
+            not self._stale and self.refreshed_at is not None
+            and time.monotonic() - self.refreshed_at < TOPOLOGY_REFRESH_INTERVAL
+        )
+
+    def _compute_version(self) -> str:
+        graph = {
+            kind: [{field: item.get(field) for field in fields} for item in getattr(self, kind)]
+            for kind, fields in _VERSION_FIELDS.items()
+        }
+        graph['profile_inbounds'] = {
+            uuid: sorted(str(inbound.get('uuid')) for inbound in inbounds)
+            for uuid, inbounds in self.profile_inbounds.items()
+        }
+        payload = json.dumps(graph, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    async def refresh(self) -> bool:
+        """Reload the whole graph; concurrent callers wait for the running refresh"""
+        if self._lock.locked():
+            async with self._lock:
+                return self.refreshed_at is not None
+
+        async with self._lock:
+            from modules.api.hosts import HostAPI
+            from modules.api.inbounds import InboundAPI
+            from modules.api.nodes import NodeAPI
+
+            started = time.monotonic()
+            self._stale = False
+            profiles, inbounds, hosts, nodes = await asyncio.gather(
+                ConfigProfileAPI.get_profiles(), InboundAPI.get_inbounds(),
+                HostAPI.get_all_hosts(), NodeAPI.get_all_nodes(),
+                return_exceptions=True
+            )
+            if not isinstance(profiles, list) or not profiles:
+                logger.warning("Topology refresh failed: не удалось получить профили конфигурации")
+                self._stale = True
+                return False
+
+            profile_uuids = [str(p['uuid']) for p in profiles if isinstance(p, dict) and p.get('uuid')]
+            results = await asyncio.gather(
+                *(ConfigProfileAPI.get_profile_inbounds(uuid) for uuid in profile_uuids),
+                return_exceptions=True
+            )
+            profile_inbounds = {}
+            for uuid, result in zip(profile_uuids, results):
+                if isinstance(result, list):
+                    profile_inbounds[uuid] = result
+                else:
+                    profile_inbounds[uuid] = self.profile_inbounds.get(uuid, [])
+
+            self.profiles = profiles
+            self.inbounds = _items(inbounds, 'inbounds') if not isinstance(inbounds, Exception) else self.inbounds
+            self.profile_inbounds = profile_inbounds
+            self.hosts = _items(hosts, 'hosts') if not isinstance(hosts, Exception) else self.hosts
+            self.nodes = _items(nodes, 'nodes') if not isinstance(nodes, Exception) else self.nodes
+            self.refreshed_at = time.monotonic()
+
+            version = self._compute_version()
+            changed, self.version = version != self.version, version
+            logger.info(
+                f"Topology refreshed in {time.monotonic() - started:.2f}s: {len(self.profiles)} profiles, "
+                f"{len(self.inbounds)} inbounds, {len(self.hosts)} hosts, {len(self.nodes)} nodes"
+                f"{f', version {version[:8]}' if changed else ''}"
+            )
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(version)
+                except Exception as e:
+                    logger.error(f"Topology listener failed: {e}")
+        return True
+
+    async def ensure_fresh(self):
+        if not self.is_fresh:
+            await self.refresh()
+
+    def invalidate(self):
+        """Mark the graph stale after our own writes and reload it in the background"""
+        self._stale = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_again = True
+            return
+        self._refresh_task = asyncio.ensure_future(self.refresh())
+        self._refresh_task.add_done_callback(self._on_refresh_done)
+
+    def _on_refresh_done(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background topology refresh failed: {task.exception()}")
+        if self._refresh_again:
+            self._refresh_again = False
+            self.invalidate()
+
+    async def get_profiles(self) -> List[Dict[str, Any]]:
+        await self.ensure_fresh()
+        return self.profiles
+
+    async def get_profile_inbounds(self, profile_uuid: str) -> List[Dict[str, Any]]:
+        await self.ensure_fresh()
+        return self.profile_inbounds.get(str(profile_uuid), [])
+
+    async def get_inbounds(self) -> List[Dict[str, Any]]:
+        await self.ensure_fresh()
+        return self.inbounds
+
+
+topology_cache = TopologyCache()
+
+
+async def refresh_topology(context=None):
+    """JobQueue callback for periodic topology refresh"""
+    try:
+        await topology_cache.refresh()
+    except Exception as e:
+        logger.error(f"Error refreshing topology: {e}")
+
+
+def start_topology_refresh(application):
+    """Schedule background topology refreshes"""
+    if application.job_queue is None:
+        logger.warning("JobQueue недоступна, топология будет загружаться по запросу")
+        return
+    application.job_queue.run_repeating(
+        refresh_topology,
+        interval=TOPOLOGY_REFRESH_INTERVAL,
+        first=0,
+        name=TOPOLOGY_JOB_NAME
+    )
+    logger.info(f"Topology refresh scheduled: interval={TOPOLOGY_REFRESH_INTERVAL}s")
@@ -0,0 +1,123 @@
+"""
+Триграммный поисковый индекс по локальному зеркалу пользователей
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from modules.api.user_mirror import user_mirror
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('username', 'description', 'email', 'tag', 'shortUuid', 'uuid', 'telegramId')
+
+GRAM_SIZE = 3
+# Маркер начала значения: позволяет искать по префиксу через те же триграммы
+PREFIX_MARK = "\x02" * (GRAM_SIZE - 1)
+
+
+def _grams(value: str) -> Set[str]:
+    return {value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1)}
+
+
+class UserSearchIndex:
+    """Inverted n-gram index over user fields, updated incrementally from the mirror"""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        # uuid -> нормализованные значения полей в порядке SEARCH_FIELDS
+        self._values: Dict[str, Tuple[str, ...]] = {}
+        # uuid -> все значения через разделитель: быстрый проход для коротких запросов
+        self._haystacks: Dict[str, str] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._values)
+
+    @staticmethod
+    def _normalize(user: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(user.get(field) or '').lower() for field in SEARCH_FIELDS)
+
+    @staticmethod
+    def _value_grams(values: Tuple[str, ...]) -> Set[str]:
+        grams: Set[str] = set()
+        for value in values:
+            if value:
+                grams |= _grams(PREFIX_MARK + value)
+        return grams
+
+    def _drop(self, uuid: str):
+        values = self._values.pop(uuid, None)
+        self._haystacks.pop(uuid, None)
+        if values is None:
+            return
+        for gram in self._value_grams(values):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(uuid)
+                if not posting:
+                    del self._postings[gram]
+
+    def apply(self, upserted: List[Dict[str, Any]], removed: List[str]):
+        """Mirror listener: reindex changed users, drop removed ones"""
+        for uuid in removed:
+            self._drop(uuid)
+        for user in upserted:
+            uuid = str(user.get('uuid') or '')
+            if not uuid:
+                continue
+            values = self._normalize(user)
+            if self._values.get(uuid) == values:
+                continue
+            self._drop(uuid)
+            self._values[uuid] = values
+            self._haystacks[uuid] = "\x00".join(values)
+            for gram in self._value_grams(values):
+                self._postings.setdefault(gram, set()).add(uuid)
+
+    def search(self, term: str, fields: Optional[Iterable[str]] = None, prefix: bool = False) -> List[str]:
+        """Return UUIDs whose fields contain (or start with) the term"""
+        term = (term or '').strip().lower()
+        if not term:
+            return []
+        positions = range(len(SEARCH_FIELDS)) if fields is None else [
+            SEARCH_FIELDS.index(field) for field in fields if field in SEARCH_FIELDS
+        ]
+
+        query = PREFIX_MARK + term if prefix else term
+        grams = _grams(query)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+        elif fields is None:
+            # Подстрока короче триграммы — один проход по склеенным значениям
+            return [uuid for uuid, haystack in self._haystacks.items() if term in haystack]
+        else:
+            candidates = self._values.keys()
+
+        if prefix:
+            matches = lambda value: value.startswith(term)
+        else:
+            matches = lambda value: term in value
+
+        result = []
+        for uuid in candidates:
+            values = self._values[uuid]
+            if any(matches(values[i]) for i in positions):
+                result.append(uuid)
+        return result
+
+
+user_index = UserSearchIndex()
+user_mirror.add_listener(user_index.apply)
+
+
+async def search_users(term: str, fields: Optional[Iterable[str]] = None, prefix: bool = False) -> List[Dict[str, Any]]:
+    """Search mirrored users via the index, sorted by username"""
+    await user_mirror.ensure_loaded()
+    users = user_mirror.lookup(user_index.search(term, fields, prefix))
+    users.sort(key=lambda u: (u.get('username') or '').lower())
+    return users
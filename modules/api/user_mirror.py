@@ -0,0 +1,222 @@
+"""
+Локальное зеркало пользователей панели с фоновой синхронизацией
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from modules.api.client import RemnaAPI
+from modules.api.snapshot import snapshot_store
+from modules.api.user_record import UserRecord
+from modules.config import USER_MIRROR_IDLE_TIMEOUT, USER_MIRROR_SYNC_INTERVAL
+from modules.utils.update_processor import bot_is_idle
+
+logger = logging.getLogger(__name__)
+
+USER_MIRROR_JOB_NAME = "user_mirror_sync"
+
+
+def _bot_is_idle() -> bool:
+    return bot_is_idle(USER_MIRROR_IDLE_TIMEOUT)
+
+
+class UserMirror:
+    """In-memory copy of all panel users as compact records, refreshed in the background"""
+
+    def __init__(self):
+        self._users: Dict[str, UserRecord] = {}
+        self._lock = asyncio.Lock()
+        # Наши записи, сделанные во время синхронизации: применяются поверх загруженных страниц
+        self._pending_writes: Dict[str, Optional[UserRecord]] = {}
+        # Подписчики на изменения (upserted users, removed uuids), например поисковый индекс
+        self._listeners: List[Callable[[List[UserRecord], List[str]], None]] = []
+        self.loaded = False
+        self.last_sync_at: Optional[float] = None
+        # monotonic-время последней успешной синхронизации (None — данные только из снимка или не загружены)
+        self._synced_at: Optional[float] = None
+        self._sync_task: Optional[asyncio.Future] = None
+        # Синхронизацию запросили, пока шла предыдущая: ее результат может не включать новые изменения
+        self._sync_again = False
+
+    @property
+    def count(self) -> int:
+        return len(self._users)
+
+    def add_listener(self, listener: Callable[[List[UserRecord], List[str]], None], replay: bool = True):
+        """Subscribe to mirror changes; with replay the listener first receives the current contents"""
+        self._listeners.append(listener)
+        if replay and self._users:
+            listener(list(self._users.values()), [])
+
+    def _notify(self, upserted: List[UserRecord], removed: List[str]):
+        if not upserted and not removed:
+            return
+        for listener in self._listeners:
+            try:
+                listener(upserted, removed)
+            except Exception as e:
+                logger.error(f"User mirror listener failed: {e}")
+
+    def restore(self, users: List[Dict[str, Any]]):
+        """Seed the mirror from a saved snapshot; the next sync reconciles it with the panel"""
+        records = (UserRecord(user) for user in users if isinstance(user, dict) and user.get('uuid'))
+        self._users = {record.uuid: record for record in records}
+        self.loaded = True
+        self._notify(list(self._users.values()), [])
+        logger.info(f"User mirror restored from snapshot: {len(self._users)} users")
+
+    def lookup(self, uuids: Iterable[str]) -> List[UserRecord]:
+        """Resolve UUIDs to mirrored users without triggering a load"""
+        return [self._users[uuid] for uuid in uuids if uuid in self._users]
+
+    async def ensure_loaded(self) -> bool:
+        """Perform the initial full load if it has not happened yet.
+
+        Once loaded, reads never wait for the panel; if the data is older than the sync interval
+        (the periodic job pauses while the bot is idle) a background refresh is scheduled.
+        """
+        if not self.loaded:
+            await self.sync()
+        elif not _bot_is_idle() and (
+            self._synced_at is None or time.monotonic() - self._synced_at > USER_MIRROR_SYNC_INTERVAL
+        ):
+            self.request_sync()
+        return self.loaded
+
+    async def get_users(self) -> List[UserRecord]:
+        """Return all mirrored users (panel order)"""
+        await self.ensure_loaded()
+        return list(self._users.values())
+
+    async def get_user(self, uuid: str) -> Optional[UserRecord]:
+        """Return a mirrored user by UUID"""
+        await self.ensure_loaded()
+        return self._users.get(str(uuid))
+
+    def upsert(self, user: Dict[str, Any]):
+        """Apply a user returned by our own create/update call"""
+        if not isinstance(user, dict) or not user.get('uuid'):
+            return
+        record = UserRecord(user)
+        self._users[record.uuid] = record
+        if self._lock.locked():
+            self._pending_writes[record.uuid] = record
+        self._notify([record], [])
+
+    def remove(self, uuid: str):
+        """Apply our own user deletion"""
+        uuid = str(uuid)
+        existed = self._users.pop(uuid, None) is not None
+        if self._lock.locked():
+            self._pending_writes[uuid] = None
+        if existed:
+            self._notify([], [uuid])
+
+    def request_sync(self):
+        """Schedule a background sync (after bulk operations affecting many users)"""
+        if self._sync_task is not None and not self._sync_task.done():
+            self._sync_again = True
+            return
+        self._sync_task = asyncio.ensure_future(self.sync())
+        self._sync_task.add_done_callback(self._on_sync_done)
+
+    def _on_sync_done(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background user mirror sync failed: {task.exception()}")
+        if self._sync_again:
+            self._sync_again = False
+            self.request_sync()
+
+    async def sync(self) -> bool:
+        """Fetch all users and apply the difference (by updatedAt) to the mirror.
+
+        The panel has no changed-since filter, so every sync reads all pages; only the
+        listeners see a delta.
+        """
+        if self._lock.locked():
+            # Синхронизация уже выполняется — дожидаемся ее вместо второго скана
+            async with self._lock:
+                return self.loaded
+
+        async with self._lock:
+            started = time.monotonic()
+            users = await RemnaAPI.get_paginated("users", "users", strict=True)
+            if users is None:
+                logger.warning("User mirror sync failed: не удалось получить все страницы пользователей")
+                self._pending_writes.clear()
+                return False
+
+            fresh: Dict[str, UserRecord] = {}
+            changed: List[UserRecord] = []
+            for user in users:
+                if not isinstance(user, dict) or not user.get('uuid'):
+                    continue
+                record = UserRecord(user)
+                previous = self._users.get(record.uuid)
+                if previous is None or previous.updated_at != record.updated_at:
+                    changed.append(record)
+                # Счетчики трафика и onlineAt меняются без updatedAt, поэтому храним свежую запись
+                fresh[record.uuid] = record
+
+            for uuid, record in self._pending_writes.items():
+                if record is None:
+                    fresh.pop(uuid, None)
+                else:
+                    fresh[uuid] = record
+                    changed.append(record)
+            self._pending_writes.clear()
+            removed = [uuid for uuid in self._users if uuid not in fresh]
+
+            initial = not self.loaded
+            self._users = fresh
+            self.loaded = True
+            self.last_sync_at = time.time()
+            self._synced_at = time.monotonic()
+
+            elapsed = time.monotonic() - started
+            if initial:
+                logger.info(f"User mirror loaded: {len(fresh)} users in {elapsed:.2f}s")
+            else:
+                logger.info(f"User mirror refresh: {len(changed)} upserted, {len(removed)} removed, {len(fresh)} total in {elapsed:.2f}s")
+            self._notify(changed, removed)
+            return True
+
+
+user_mirror = UserMirror()
+
+
+async def sync_user_mirror(context=None):
+    """JobQueue callback for periodic mirror refresh; skipped while nobody uses the bot"""
+    if user_mirror.loaded and _bot_is_idle():
+        logger.debug("User mirror sync skipped: no bot activity")
+        return
+    try:
+        await user_mirror.sync()
+        await snapshot_store.flush_users()
+    except Exception as e:
+        logger.error(f"Error syncing user mirror: {e}")
+
+
+async def restore_user_mirror():
+    """Load users from the SQLite snapshot (if enabled) and keep the snapshot updated"""
+    if not await snapshot_store.open():
+        return
+    users = await snapshot_store.load_users()
+    if users:
+        user_mirror.restore(users)
+    user_mirror.add_listener(snapshot_store.track_users, replay=False)
+
+
+def start_user_mirror(application):
+    """Schedule the initial full load and periodic refreshes"""
+    if application.job_queue is None:
+        logger.warning("JobQueue недоступна, зеркало пользователей будет загружаться по запросу")
+        return
+    application.job_queue.run_repeating(
+        sync_user_mirror,
+        interval=USER_MIRROR_SYNC_INTERVAL,
+        first=0,
+        name=USER_MIRROR_JOB_NAME
+    )
+    logger.info(f"User mirror sync scheduled: interval={USER_MIRROR_SYNC_INTERVAL}s")
@@ -0,0 +1,98 @@
+"""
+Компактная запись пользователя для локального зеркала
+"""
+import sys
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Ключ API -> слот записи
+_FIELDS: Dict[str, str] = {
+    'uuid': 'uuid',
+    'shortUuid': 'short_uuid',
+    'username': 'username',
+    'status': 'status',
+    'trafficLimitStrategy': 'traffic_limit_strategy',
+    'usedTrafficBytes': 'used_traffic_bytes',
+    'lifetimeUsedTrafficBytes': 'lifetime_used_traffic_bytes',
+    'trafficLimitBytes': 'traffic_limit_bytes',
+    'expireAt': 'expire_at',
+    'onlineAt': 'online_at',
+    'createdAt': 'created_at',
+    'updatedAt': 'updated_at',
+    'description': 'description',
+    'email': 'email',
+    'tag': 'tag',
+    'telegramId': 'telegram_id',
+    'hwidDeviceLimit': 'hwid_device_limit',
+    'subscriptionUrl': 'subscription_url',
+}
+
+# Значения из небольшого набора, которые повторяются у тысяч пользователей
+_INTERNED = ('status', 'trafficLimitStrategy', 'tag')
+_COUNTERS = ('usedTrafficBytes', 'lifetimeUsedTrafficBytes', 'trafficLimitBytes')
+
+# Вложенные поля, нужные для привязки пользователей к инбаундам; остальное (пароли, ссылки) не храним
+_EXTRA_KEYS = (
+    'activeInternalSquads', 'subscription', 'subscriptions', 'inbounds', 'activeInbounds',
+    'configProfile', 'configProfileUuid', 'subscriptionUuid', 'lastConnectedNode',
+)
+
+
+def _counter(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class UserRecord:
+    """Slots-based user entry with a read-only dict interface over the original API keys"""
+
+    __slots__ = tuple(_FIELDS.values()) + ('extra',)
+
+    def __init__(self, user: Dict[str, Any]):
+        for key, slot in _FIELDS.items():
+            value = user.get(key)
+            if key in _COUNTERS:
+                value = _counter(value)
+            elif key in _INTERNED and isinstance(value, str):
+                value = sys.intern(value)
+            elif key == 'uuid':
+                value = str(value)
+            setattr(self, slot, value)
+        extra = {key: user[key] for key in _EXTRA_KEYS if user.get(key) is not None}
+        self.extra: Optional[Dict[str, Any]] = extra or None
+
+    def __getitem__(self, key: str) -> Any:
+        slot = _FIELDS.get(key)
+        if slot is not None:
+            return getattr(self, slot)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key, slot in _FIELDS.items():
+            value = getattr(self, slot)
+            if value is not None:
+                yield key, value
+        if self.extra:
+            yield from self.extra.items()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"UserRecord(uuid={self.uuid!r}, username={self.username!r}, status={self.status!r})"
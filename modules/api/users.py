@@ -1,5 +1,10 @@
 import logging
 from modules.api.client import RemnaAPI
+from modules.api.user_mirror import user_mirror
+from modules.api.user_index import search_users
+from modules.api.snapshot import snapshot_store
+from modules.api.health import circuit_breaker
+from modules.api.stats import get_user_totals
 import re
 
 logger = logging.getLogger(__name__)
@@ -9,48 +14,12 @@ class UserAPI:
     
     @staticmethod
     async def get_all_users():
-        """Get all users with pagination support"""
-        all_users = []
-        start = 0
-        size = 500  # Maximum allowed by API
-        
-        while True:
-            # Get batch of users
-            params = {
-                'size': size,
-                'start': start
-            }
-            
-            try:
-                response = await RemnaAPI.get("users", params=params)
-                
-                if not response:
-                    break
-                
-                # Handle different response structures
-                users = []
-                if isinstance(response, dict):
-                    if 'users' in response:
-                        users = response['users']
-                    elif 'response' in response and 'users' in response['response']:
-                        users = response['response']['users']
-                elif isinstance(response, list):
-                    users = response
-                
-                if not users:
-                    break
-                
-                all_users.extend(users)
-                
-                # If we got less than requested size, we've reached the end
-                if len(users) < size:
-                    break
-                
-                start += size
-                
-            except Exception as e:
-                logger.error(f"Error fetching users batch (start={start}, size={size}): {e}")
-                break
+        """Get all users, fetching pages concurrently"""
+        try:
+            all_users = await RemnaAPI.get_paginated("users", "users")
+        except Exception as e:
+            logger.error(f"Error fetching users: {e}")
+            all_users = []
         
         logger.info(f"Retrieved {len(all_users)} users total")
         return {'users': all_users} if all_users else []
@@ -59,28 +28,7 @@ class UserAPI:
     async def get_users_count():
         """Get total number of users efficiently"""
         try:
-            # Try to get just first page to check total count
-            params = {'size': 1, 'start': 0}
-            response = await RemnaAPI.get("users", params=params)
-            
-            if response and isinstance(response, dict):
-                # If API returns total count in response
-                if 'total' in response:
-                    return response['total']
-                elif 'count' in response:
-                    return response['count']
-            
-            # Fallback: get all users and count them
-            all_users_response = await UserAPI.get_all_users()
-            if all_users_response:
-                users = []
-                if isinstance(all_users_response, dict) and 'users' in all_users_response:
-                    users = all_users_response['users']
-                elif isinstance(all_users_response, list):
-                    users = all_users_response
-                return len(users)
-            
-            return 0
+            return (await get_user_totals())['count']
         except Exception as e:
             logger.error(f"Error getting users count: {e}")
             return 0
@@ -110,6 +58,8 @@ class UserAPI:
     async def get_user_by_telegram_id(telegram_id):
         """Get user by Telegram ID"""
         result = await RemnaAPI.get(f"users/by-telegram-id/{telegram_id}")
+        if result is None and not circuit_breaker.is_available:
+            return await snapshot_store.query_users(telegram_id=telegram_id)
         return result if result else []
     
     @staticmethod
@@ -122,6 +72,8 @@ class UserAPI:
     async def get_user_by_tag(tag):
         """Get user by tag"""
         result = await RemnaAPI.get(f"users/by-tag/{tag}")
+        if result is None and not circuit_breaker.is_available:
+            return await snapshot_store.query_users(tag=tag)
         return result if result else []
     
     @staticmethod
@@ -185,7 +137,9 @@ class UserAPI:
         # Финальное логирование перед отправкой
         logger.info(f"Final user data before API request: trafficLimitStrategy='{user_data.get('trafficLimitStrategy')}', hwidDeviceLimit={user_data.get('hwidDeviceLimit', 'Not set')}")
         
-        return await RemnaAPI.post("users", user_data)
+        result = await RemnaAPI.post("users", user_data)
+        user_mirror.upsert(result)
+        return result
     
     @staticmethod
     async def update_user(uuid, update_data):
@@ -196,32 +150,45 @@ class UserAPI:
         # Логируем данные для отладки
         logger.debug(f"Updating user {uuid} with data: {update_data}")
         
-        return await RemnaAPI.patch("users", update_data)
+        result = await RemnaAPI.patch("users", update_data)
+        user_mirror.upsert(result)
+        return result
     
     @staticmethod
     async def delete_user(uuid):
         """Delete a user"""
-        return await RemnaAPI.delete(f"users/{uuid}")
+        result = await RemnaAPI.delete(f"users/{uuid}")
+        if result:
+            user_mirror.remove(uuid)
+        return result
     
     @staticmethod
     async def revoke_user_subscription(uuid):
         """Revoke user subscription"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/revoke")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/revoke")
+        user_mirror.upsert(result)
+        return result
     
     @staticmethod
     async def disable_user(uuid):
         """Disable a user using v2113 actions endpoint"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/disable")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/disable")
+        user_mirror.upsert(result)
+        return result
     
     @staticmethod
     async def enable_user(uuid):
         """Enable a user using v2113 actions endpoint"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/enable")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/enable")
+        user_mirror.upsert(result)
+        return result
     
     @staticmethod
     async def reset_user_traffic(uuid):
         """Reset user traffic"""
-        return await RemnaAPI.post(f"users/{uuid}/actions/reset-traffic")
+        result = await RemnaAPI.post(f"users/{uuid}/actions/reset-traffic")
+        user_mirror.upsert(result)
+        return result
     
     
     @staticmethod
@@ -295,31 +262,7 @@ class UserAPI:
     async def search_users_by_partial_name(partial_name):
         """Search users by partial name match"""
         try:
-            response = await UserAPI.get_all_users()
-            if not response:
-                return []
-            
-            # Обрабатываем разные структуры ответа
-            users = []
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users']
-                elif 'response' in response and 'users' in response['response']:
-                    users = response['response']['users']
-            elif isinstance(response, list):
-                users = response
-            
-            if not users:
-                return []
-            
-            partial_name_lower = partial_name.lower()
-            matching_users = []
-            
-            for user in users:
-                if partial_name_lower in user.get("username", "").lower():
-                    matching_users.append(user)
-            
-            return matching_users
+            return await search_users(partial_name, fields=('username',))
         except Exception as e:
             logger.error(f"Error searching users by partial name: {e}")
             return []
@@ -328,32 +271,7 @@ class UserAPI:
     async def search_users_by_description(description_keyword):
         """Search users by description keyword"""
         try:
-            response = await UserAPI.get_all_users()
-            if not response:
-                return []
-            
-            # Обрабатываем разные структуры ответа
-            users = []
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users']
-                elif 'response' in response and 'users' in response['response']:
-                    users = response['response']['users']
-            elif isinstance(response, list):
-                users = response
-            
-            if not users:
-                return []
-            
-            keyword_lower = description_keyword.lower()
-            matching_users = []
-            
-            for user in users:
-                user_description = user.get("description", "")
-                if user_description and keyword_lower in user_description.lower():
-                    matching_users.append(user)
-            
-            return matching_users
+            return await search_users(description_keyword, fields=('description',))
         except Exception as e:
             logger.error(f"Error searching users by description: {e}")
             return []
@@ -362,34 +280,11 @@ class UserAPI:
     async def get_users_stats():
         """Get user statistics efficiently"""
         try:
-            # For now, we need to get all users to calculate stats
-            # TODO: Optimize when API provides stats endpoint
-            response = await UserAPI.get_all_users()
-            
-            stats = {'ACTIVE': 0, 'DISABLED': 0, 'LIMITED': 0, 'EXPIRED': 0}
-            total_traffic = 0
-            
-            if response:
-                users = []
-                if isinstance(response, dict) and 'users' in response:
-                    users = response['users']
-                elif isinstance(response, list):
-                    users = response
-                
-                for user in users:
-                    status = user.get('status', 'UNKNOWN')
-                    if status in stats:
-                        stats[status] += 1
-                    
-                    # Calculate traffic
-                    traffic_used = user.get('trafficUsed', 0)
-                    if isinstance(traffic_used, (int, float)):
-                        total_traffic += traffic_used
-            
+            totals = await get_user_totals()
             return {
-                'count': len(users) if 'users' in locals() else 0,
-                'stats': stats,
-                'total_traffic': total_traffic
+                'count': totals['count'],
+                'stats': totals['stats'],
+                'total_traffic': totals['total_traffic']
             }
         except Exception as e:
             logger.error(f"Error getting users stats: {e}")
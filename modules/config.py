@@ -54,8 +54,75 @@ if _raw_cookies and not API_COOKIES:
 API_BASE_URL = os.getenv("API_BASE_URL", "http://remnawave:3000/api")
 API_TOKEN = os.getenv("REMNAWAVE_API_TOKEN")
 
+# Настройки пула HTTP-соединений к API панели
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "30"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "20"))
+API_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("API_MAX_KEEPALIVE_CONNECTIONS", "10"))
+API_KEEPALIVE_EXPIRY = float(os.getenv("API_KEEPALIVE_EXPIRY", "60"))
+
+# Фоновая проверка доступности панели и circuit breaker
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "30"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RECOVERY_TIMEOUT = int(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "30"))
+
+# Параллельная загрузка постраничных списков (пользователи и т.п.)
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", "500"))
+API_PAGE_CONCURRENCY = int(os.getenv("API_PAGE_CONCURRENCY", "4"))
+API_PAGE_RETRIES = int(os.getenv("API_PAGE_RETRIES", "2"))
+
+# Массовые операции: размер пачки для bulk-эндпоинтов, параллелизм и повторы поштучных запросов
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_RETRIES = int(os.getenv("BULK_RETRIES", "2"))
+# Как часто обновлять сообщение с прогрессом массовой операции (секунды)
+BULK_PROGRESS_INTERVAL = float(os.getenv("BULK_PROGRESS_INTERVAL", "3"))
+
+# Кэши перевода интерфейса: сколько переведенных текстов и клавиатур держать в памяти (0 — без кэша)
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2048"))
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "256"))
+
+# Токены callback_data вместо UUID в кнопках: срок жизни (секунды) и максимум токенов в памяти
+CALLBACK_TOKEN_TTL = int(os.getenv("CALLBACK_TOKEN_TTL", "86400"))
+CALLBACK_REGISTRY_SIZE = int(os.getenv("CALLBACK_REGISTRY_SIZE", "20000"))
+
+# Интервал фоновой синхронизации локального зеркала пользователей (секунды)
+USER_MIRROR_SYNC_INTERVAL = int(os.getenv("USER_MIRROR_SYNC_INTERVAL", "600"))
+# Синхронизация пропускается, если боту не писали столько секунд (0 — синхронизировать всегда)
+USER_MIRROR_IDLE_TIMEOUT = int(os.getenv("USER_MIRROR_IDLE_TIMEOUT", "1800"))
+# Как долго индекс инбаунд -> пользователи использует загруженные сквады и профили (секунды)
+INBOUND_INDEX_TTL = int(os.getenv("INBOUND_INDEX_TTL", "300"))
+# Интервал фонового обновления топологии панели: профили, инбаунды, хосты, ноды (секунды)
+TOPOLOGY_REFRESH_INTERVAL = int(os.getenv("TOPOLOGY_REFRESH_INTERVAL", "300"))
+
+# Путь к SQLite-снимку данных панели (пусто — снимок отключен)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "").strip()
+# Сохранение состояния диалогов и user_data между перезапусками (пусто — отключено)
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "").strip()
+# Как часто собирать изменения состояния и через сколько секунд после изменения писать их на диск
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "10"))
+PERSISTENCE_FLUSH_DELAY = float(os.getenv("PERSISTENCE_FLUSH_DELAY", "2"))
+
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Способ получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Встроенный webhook-сервер (BOT_MODE=webhook): публичный HTTPS-адрес, локальный адрес/порт и путь
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip().strip("/")
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token (A-Z, a-z, 0-9, _ и -)
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "").strip()
+# Сбрасывать накопившиеся за время простоя обновления при старте
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "false").lower() == "true"
+# Сколько обновлений обрабатывать одновременно (обновления одного чата всегда идут по очереди)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+# Лимиты исходящих запросов к Telegram: сообщений в секунду на бота и на личный чат
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "25"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+# Сколько раз повторять запрос после ответа RetryAfter (flood control)
+OUTBOUND_RETRY_ATTEMPTS = int(os.getenv("OUTBOUND_RETRY_ATTEMPTS", "3"))
+
 # Parse admin user IDs with detailed logging
 admin_ids_str = os.getenv("ADMIN_USER_IDS", "")
 logger.info(f"Raw ADMIN_USER_IDS from env: '{admin_ids_str}'")
@@ -136,6 +203,12 @@ DASHBOARD_SHOW_USERS_COUNT = os.getenv("DASHBOARD_SHOW_USERS_COUNT", "true").low
 DASHBOARD_SHOW_NODES_COUNT = os.getenv("DASHBOARD_SHOW_NODES_COUNT", "true").lower() == "true"
 DASHBOARD_SHOW_TRAFFIC_STATS = os.getenv("DASHBOARD_SHOW_TRAFFIC_STATS", "true").lower() == "true"
 DASHBOARD_SHOW_UPTIME = os.getenv("DASHBOARD_SHOW_UPTIME", "true").lower() == "true"
+# Сколько ждать каждую секцию главного экрана, прежде чем показать последние известные данные (секунды)
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "4"))
+# Интервал фонового обновления статистики главного экрана (секунды, 0 — собирать при каждом открытии)
+DASHBOARD_REFRESH_INTERVAL = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "30"))
+# Фоновое обновление пропускается, если боту не писали столько секунд (0 — обновлять всегда)
+DASHBOARD_IDLE_TIMEOUT = int(os.getenv("DASHBOARD_IDLE_TIMEOUT", "1800"))
 
 # Настройки поиска пользователей
 ENABLE_PARTIAL_SEARCH = os.getenv("ENABLE_PARTIAL_SEARCH", "true").lower() == "true"
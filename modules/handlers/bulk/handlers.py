@@ -4,9 +4,11 @@ import logging
 
 from modules.config import MAIN_MENU, BULK_MENU, BULK_ACTION, BULK_CONFIRM
 from modules.api.bulk import BulkAPI
-from modules.api.users import UserAPI
+from modules.api.user_mirror import user_mirror
+from modules.handlers.bulk.jobs import get_active_job, start_bulk_job, start_panel_job
 from modules.utils.selection_helpers import SelectionHelper
 from modules.handlers.core.start import show_main_menu
+from modules.handlers.users.handlers import BulkOperations
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,7 @@ async def show_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show bulk operations menu"""
     keyboard = [
         [InlineKeyboardButton("🔄 Сбросить трафик всем", callback_data="bulk_reset_all_traffic")],
+        [InlineKeyboardButton("🔄 Сбросить трафик ограниченным", callback_data="bulk_reset_limited_traffic")],
         [InlineKeyboardButton("❌ Удалить неактивных", callback_data="bulk_delete_inactive")],
         [InlineKeyboardButton("❌ Удалить истекших", callback_data="bulk_delete_expired")],
         [InlineKeyboardButton("🔄 Массовое обновление", callback_data="bulk_update_all")],
@@ -56,6 +59,23 @@ async def handle_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return BULK_CONFIRM
 
+    elif data == "bulk_reset_limited_traffic":
+        # Confirm reset traffic of users who hit their limit
+        keyboard = [
+            [
+                InlineKeyboardButton("✅ Да, сбросить", callback_data="confirm_reset_limited_traffic"),
+                InlineKeyboardButton("❌ Отмена", callback_data="back_to_bulk")
+            ]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await query.edit_message_text(
+            "⚠️ Сбросить трафик всем пользователям, исчерпавшим лимит (статус LIMITED)?",
+            reply_markup=reply_markup,
+            parse_mode="Markdown"
+        )
+        return BULK_CONFIRM
+
     elif data == "bulk_delete_inactive":
         # Confirm delete inactive
         keyboard = [
@@ -108,77 +128,59 @@ async def handle_bulk_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return BULK_MENU
 
+async def _collect_user_uuids(status):
+    """UUIDs of users with the status from a fresh mirror sync; None if the sync failed"""
+    if not await user_mirror.sync():
+        return None
+    return [user.uuid for user in await user_mirror.get_users() if user.status == status]
+
 async def handle_bulk_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle bulk operation confirmation"""
     query = update.callback_query
-    await query.answer()
-
     data = query.data
 
+    if data.startswith("confirm_") and get_active_job(update.effective_chat.id):
+        await query.answer("⏳ Массовая операция уже выполняется, дождитесь завершения или отмените ее.", show_alert=True)
+        return BULK_CONFIRM
+
+    await query.answer()
+
     if data == "confirm_reset_all_traffic":
-        # Reset all users traffic
-        result = await BulkAPI.bulk_reset_all_users_traffic()
-        
-        if result:
-            message = "✅ Трафик успешно сброшен у всех пользователей."
-        else:
-            message = "❌ Ошибка при сбросе трафика."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        # Панель сама выбирает пользователей: результат не зависит от актуальности локального зеркала
+        await start_panel_job(
+            update, context, "Сброс трафика всем пользователям", BulkAPI.bulk_reset_all_users_traffic
         )
-        return BULK_MENU
 
-    elif data == "confirm_delete_inactive":
-        # Delete all inactive users
-        result = await BulkAPI.bulk_delete_users_by_status("DISABLED")
-        
-        if result:
-            message = f"✅ Успешно удалено {result.get('deletedCount', 0)} неактивных пользователей."
+    elif data == "confirm_reset_limited_traffic":
+        # У панели нет сброса трафика по статусу: список собираем сами, но только из свежей синхронизации
+        uuids = await _collect_user_uuids("LIMITED")
+        back = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]])
+        if uuids is None:
+            await query.edit_message_text(
+                "❌ Не удалось получить актуальный список пользователей, операция не выполнена.",
+                reply_markup=back
+            )
+        elif not uuids:
+            await query.edit_message_text("ℹ️ Нет пользователей для этой операции.", reply_markup=back)
         else:
-            message = "❌ Ошибка при удалении пользователей."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+            await start_bulk_job(
+                update, context, "Сброс трафика ограниченным пользователям", uuids,
+                BulkOperations.bulk_reset_traffic
+            )
+
+    elif data == "confirm_delete_inactive":
+        await start_panel_job(
+            update, context, "Удаление неактивных пользователей",
+            lambda: BulkAPI.bulk_delete_users_by_status("DISABLED")
         )
-        return BULK_MENU
 
     elif data == "confirm_delete_expired":
-        # Delete all expired users
-        result = await BulkAPI.bulk_delete_users_by_status("EXPIRED")
-        
-        if result:
-            message = f"✅ Успешно удалено {result.get('deletedCount', 0)} пользователей с истекшим сроком."
-        else:
-            message = "❌ Ошибка при удалении пользователей."
-        
-        # Add back button
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        await start_panel_job(
+            update, context, "Удаление пользователей с истекшим сроком",
+            lambda: BulkAPI.bulk_delete_users_by_status("EXPIRED")
         )
-        return BULK_MENU
 
     elif data == "back_to_bulk":
         await show_bulk_menu(update, context)
-        return BULK_MENU
 
     return BULK_MENU
-
-
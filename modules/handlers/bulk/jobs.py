@@ -0,0 +1,219 @@
+"""
+Фоновые массовые операции с прогрессом в одном сообщении и кнопкой отмены
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from modules.api.bulk import affected_rows
+from modules.config import BULK_PROGRESS_INTERVAL
+from modules.utils.auth import check_authorization
+
+logger = logging.getLogger(__name__)
+
+BULK_CANCEL_CALLBACK = "bulk_cancel"
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class BulkJob:
+    """Bulk operation running in the background and reporting into one status message"""
+
+    def __init__(self, title: str, uuids: List[str], query: CallbackQuery):
+        self.title = title
+        self.uuids = list(dict.fromkeys(uuids))
+        self.total = len(self.uuids)
+        self.query = query
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self.cancel_event = asyncio.Event()
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed
+
+    def record(self, results: Dict[str, bool]):
+        """Progress callback for the bulk executor"""
+        for success in results.values():
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def render(self, finished: bool = False) -> str:
+        elapsed = max(time.monotonic() - self.started_at, 0.001)
+        remaining = self.total - self.processed
+
+        if not finished:
+            header = f"⏳ *{self.title}*"
+        elif self.cancel_event.is_set() and remaining:
+            header = f"🛑 *{self.title}: отменено*"
+        else:
+            header = f"✅ *{self.title}: завершено*"
+
+        message = f"{header}\n\n"
+        message += f"✅ Выполнено: {self.succeeded}\n"
+        message += f"❌ Ошибок: {self.failed}\n"
+        message += f"📋 Осталось: {remaining}/{self.total}\n"
+
+        rate = self.processed / elapsed
+        if not finished:
+            message += f"⚡ Скорость: {rate:.1f} польз./сек\n"
+            if self.processed and remaining:
+                message += f"⏱️ Примерно осталось: {_format_seconds(remaining / rate)}\n"
+            if self.cancel_event.is_set():
+                message += "\n🛑 Отмена: ожидаем завершения уже отправленных запросов..."
+        else:
+            message += f"⏱️ Время: {_format_seconds(elapsed)}\n"
+        return message
+
+
+# operation(uuids, on_progress=..., cancel_event=...) -> {uuid: успех}, например методы BulkOperations
+BulkOperation = Callable[..., Awaitable[Dict[str, bool]]]
+
+
+# chat_id -> активная операция; повторное нажатие не запускает вторую такую же
+_active_jobs: Dict[int, BulkJob] = {}
+
+
+def get_active_job(chat_id: int) -> Optional[BulkJob]:
+    return _active_jobs.get(chat_id)
+
+
+async def _edit_status(job: BulkJob, text: str, reply_markup: Optional[InlineKeyboardMarkup]):
+    try:
+        await job.query.edit_message_text(text, reply_markup=reply_markup, parse_mode="Markdown")
+    except BadRequest as e:
+        # "Message is not modified" и подобные — не повод прерывать операцию
+        logger.debug(f"Bulk progress edit skipped: {e}")
+    except Exception as e:
+        logger.warning(f"Bulk progress edit failed: {e}")
+
+
+def _progress_markup() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🛑 Отменить", callback_data=BULK_CANCEL_CALLBACK)]])
+
+
+def _done_markup() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_to_bulk")]])
+
+
+async def _report_progress(job: BulkJob):
+    last_rendered = None
+    while True:
+        await asyncio.sleep(BULK_PROGRESS_INTERVAL)
+        state = (job.processed, job.cancel_event.is_set())
+        if state != last_rendered:
+            last_rendered = state
+            await _edit_status(job, job.render(), _progress_markup())
+
+
+async def _run_job(
+    job: BulkJob,
+    chat_id: int,
+    operation: BulkOperation
+):
+    reporter = asyncio.create_task(_report_progress(job))
+    try:
+        await operation(job.uuids, on_progress=job.record, cancel_event=job.cancel_event)
+    except Exception as e:
+        logger.error(f"Bulk job '{job.title}' failed: {e}")
+    finally:
+        reporter.cancel()
+        _active_jobs.pop(chat_id, None)
+        logger.info(
+            f"Bulk job '{job.title}' finished: {job.succeeded} ok, {job.failed} failed, "
+            f"{job.total - job.processed} skipped"
+        )
+        await _edit_status(job, job.render(finished=True), _done_markup())
+
+
+async def start_bulk_job(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    title: str,
+    uuids: List[str],
+    operation: BulkOperation
+) -> bool:
+    """Start a bulk job in the background; the callback message becomes its status message"""
+    chat_id = update.effective_chat.id
+    if chat_id in _active_jobs:
+        return False
+
+    job = BulkJob(title, uuids, update.callback_query)
+    _active_jobs[chat_id] = job
+    await _edit_status(job, job.render(), _progress_markup())
+    context.application.create_task(_run_job(job, chat_id, operation), update=update)
+    return True
+
+
+async def _run_panel_job(job: BulkJob, chat_id: int, action: Callable[[], Awaitable]):
+    try:
+        result = await action()
+    except Exception as e:
+        logger.error(f"Bulk job '{job.title}' failed: {e}")
+        result = None
+    finally:
+        _active_jobs.pop(chat_id, None)
+
+    elapsed = _format_seconds(time.monotonic() - job.started_at)
+    affected = affected_rows(result)
+    if not result:
+        message = f"❌ *{job.title}: ошибка*\n\nПанель не подтвердила выполнение операции, проверьте результат в панели."
+    elif affected is None:
+        message = f"✅ *{job.title}: завершено*\n\n⏱️ Время: {elapsed}\n"
+    else:
+        message = f"✅ *{job.title}: завершено*\n\n✅ Затронуто пользователей: {affected}\n⏱️ Время: {elapsed}\n"
+    logger.info(f"Bulk job '{job.title}' finished on the panel: result={result!r}")
+    await _edit_status(job, message, _done_markup())
+
+
+async def start_panel_job(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    title: str,
+    action: Callable[[], Awaitable]
+) -> bool:
+    """Start a bulk operation the panel performs in one server-side call (by status, for all users).
+
+    The panel selects the users itself, so nothing depends on the local mirror being current.
+    There is no per-user progress and no cancel button: the request cannot be stopped once sent.
+    """
+    chat_id = update.effective_chat.id
+    if chat_id in _active_jobs:
+        return False
+
+    job = BulkJob(title, [], update.callback_query)
+    _active_jobs[chat_id] = job
+    await _edit_status(job, f"⏳ *{title}*\n\nПанель выполняет операцию...", None)
+    context.application.create_task(_run_panel_job(job, chat_id, action), update=update)
+    return True
+
+
+async def handle_bulk_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Stop dispatching further requests of the chat's running bulk job"""
+    query = update.callback_query
+    if not check_authorization(update.effective_user):
+        await query.answer("⛔ Вы не авторизованы для использования этого бота.", show_alert=True)
+        raise ApplicationHandlerStop
+
+    job = _active_jobs.get(update.effective_chat.id)
+    if job is None:
+        await query.answer("Операция уже завершена")
+    elif not job.total:
+        await query.answer("Операция выполняется на стороне панели и не может быть отменена", show_alert=True)
+    else:
+        job.cancel_event.set()
+        await query.answer("🛑 Операция будет остановлена")
+        await _edit_status(job, job.render(), _progress_markup())
+    raise ApplicationHandlerStop
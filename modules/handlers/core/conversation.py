@@ -24,10 +24,12 @@ from modules.utils.auth import check_authorization
 from modules.handlers.core.start import start
 from modules.handlers.core.menu import handle_menu_selection
 from modules.handlers.users import (
-    handle_users_menu, handle_user_selection, handle_user_action,
+    handle_users_menu,
     handle_action_confirmation, handle_text_input,
     handle_edit_field_selection, handle_edit_field_value,
-    handle_create_user_input, handle_cancel_user_creation
+    handle_create_user_input, handle_cancel_user_creation,
+    selecting_user_callbacks, waiting_input_callbacks,
+    handle_user_deep_link, USER_DEEP_LINK_PREFIX
 )
 from modules.handlers.nodes import (
     handle_nodes_menu, handle_node_edit_menu, handle_node_field_input, handle_cancel_node_edit,
@@ -62,10 +64,14 @@ async def unauthorized_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     # Если пользователь авторизован, но попал в fallback, перенаправляем на главное меню
     return await start(update, context)
 
-def create_conversation_handler():
-    """Create the main conversation handler"""
+def create_conversation_handler(persistent: bool = False):
+    """Create the main conversation handler; persistent states need application persistence"""
+    # /start u_<uuid> из результата inline-поиска сразу открывает карточку пользователя
+    user_deep_link = CommandHandler(
+        "start", handle_user_deep_link, filters=filters.Regex(f"^/start {USER_DEEP_LINK_PREFIX}")
+    )
     return ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[user_deep_link, CommandHandler("start", start)],
         states={
             MAIN_MENU: [
                 CallbackQueryHandler(handle_menu_selection)
@@ -101,14 +107,12 @@ def create_conversation_handler():
                 CallbackQueryHandler(handle_bulk_menu)
             ],
             SELECTING_USER: [
-                # Handle both new and legacy user action patterns
-                CallbackQueryHandler(handle_user_action, pattern="^user_action_"),
-                CallbackQueryHandler(handle_user_action, pattern="^(edit_|disable_|enable_|reset_|revoke_|delete_|hwid_|stats_|confirm_del_hwid_)"),
-                CallbackQueryHandler(handle_user_selection)
+                # Токены callback_data — по таблице действий, старые префиксы — по первому слову
+                CallbackQueryHandler(selecting_user_callbacks)
             ],
             WAITING_FOR_INPUT: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_input),
-                CallbackQueryHandler(handle_users_menu)
+                CallbackQueryHandler(waiting_input_callbacks)
             ],
             CONFIRM_ACTION: [
                 CallbackQueryHandler(handle_action_confirmation)
@@ -174,12 +178,13 @@ def create_conversation_handler():
             ],
         },
         fallbacks=[
+            user_deep_link,
             CommandHandler("start", unauthorized_handler),
             MessageHandler(filters.TEXT, unauthorized_handler),
             CallbackQueryHandler(unauthorized_handler)
         ],
         name="remnawave_admin_conversation",
-        persistent=False,
+        persistent=persistent,
         per_chat=True,
         per_user=True,
         per_message=False
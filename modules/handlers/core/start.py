@@ -3,25 +3,33 @@ from telegram.ext import ContextTypes, ConversationHandler
 from modules.config import (
     MAIN_MENU, DASHBOARD_SHOW_SYSTEM_STATS, DASHBOARD_SHOW_SERVER_INFO,
     DASHBOARD_SHOW_USERS_COUNT, DASHBOARD_SHOW_NODES_COUNT, 
-    DASHBOARD_SHOW_TRAFFIC_STATS, DASHBOARD_SHOW_UPTIME
+    DASHBOARD_SHOW_TRAFFIC_STATS, DASHBOARD_SHOW_UPTIME, DASHBOARD_SECTION_TIMEOUT,
+    DASHBOARD_REFRESH_INTERVAL, DASHBOARD_IDLE_TIMEOUT
 )
 from modules.utils.auth import (
     check_operator_or_admin,
     get_user_role,
     is_admin_user
 )
-from modules.api.users import UserAPI
 from modules.api.nodes import NodeAPI
 from modules.api.inbounds import InboundAPI
+from modules.api.health import circuit_breaker
+from modules.api.stats import get_user_totals
 from modules.handlers.core.language import LANGUAGE_MENU_CALLBACK
 from modules.localization import SUPPORTED_LANGUAGES, get_user_language
 from modules.utils.formatters import format_bytes
+from modules.utils.update_processor import bot_is_idle
+import asyncio
 import logging
+import time
+from typing import Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 ROLE_DISPLAY = {"admin": "Администратор", "operator": "Оператор"}
 
+DASHBOARD_JOB_NAME = "dashboard_snapshot"
+
 @check_operator_or_admin
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
@@ -74,204 +82,288 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
 
-async def get_system_stats():
-    """Get system statistics based on configuration settings"""
-    stats_sections = []
+async def _system_section():
+    """CPU / RAM / uptime section"""
+    # Используем данные из API для консистентности
+    from modules.api.system import SystemAPI
     
-    try:
-        # Системная информация (если включена)
-        if DASHBOARD_SHOW_SYSTEM_STATS:
-            try:
-                # Используем данные из API для консистентности
-                from modules.api.system import SystemAPI
-                
-                stats = await SystemAPI.get_stats()
-                if stats:
-                    # CPU Information
-                    cpu_cores = stats['cpu']['cores']
-                    cpu_physical_cores = stats['cpu']['physicalCores']
-                    
-                    # Memory Information with correct calculation
-                    total_mem = stats['memory']['total']
-                    free_mem = stats['memory']['free']
-                    available_mem = stats['memory'].get('available', free_mem)
-                    
-                    # Correct memory calculation for Linux systems
-                    used_mem = total_mem - available_mem
-                    used_percent = (used_mem / total_mem) * 100 if total_mem > 0 else 0
-                    
-                    system_stats = f"🖥️ *Система*:\n"
-                    system_stats += f"  • CPU: {cpu_cores} ядер ({cpu_physical_cores} физ.)\n"
-                    system_stats += f"  • RAM: {format_bytes(used_mem)} / {format_bytes(total_mem)} ({used_percent:.1f}%)\n"
-                    
-                    if DASHBOARD_SHOW_UPTIME:
-                        uptime_seconds = int(stats['uptime'])
-                        uptime_days = uptime_seconds // (24 * 3600)
-                        uptime_hours = (uptime_seconds % (24 * 3600)) // 3600
-                        uptime_minutes = (uptime_seconds % 3600) // 60
-                        system_stats += f"  • Uptime: {uptime_days}д {uptime_hours}ч {uptime_minutes}м\n"
-                    
-                    stats_sections.append(system_stats)
-                else:
-                    # Fallback to psutil if API fails
-                    import psutil
-                    from datetime import datetime
-                    
-                    cpu_cores = psutil.cpu_count()
-                    cpu_physical_cores = psutil.cpu_count(logical=False)
-                    memory = psutil.virtual_memory()
-                    
-                    system_stats = f"🖥️ *Система*:\n"
-                    system_stats += f"  • CPU: {cpu_cores} ядер ({cpu_physical_cores} физ.)\n"
-                    system_stats += f"  • RAM: {format_bytes(memory.used)} / {format_bytes(memory.total)} ({memory.percent:.1f}%)\n"
-                    
-                    if DASHBOARD_SHOW_UPTIME:
-                        uptime_seconds = psutil.boot_time()
-                        current_time = datetime.now().timestamp()
-                        uptime = int(current_time - uptime_seconds)
-                        uptime_days = uptime // (24 * 3600)
-                        uptime_hours = (uptime % (24 * 3600)) // 3600
-                        uptime_minutes = (uptime % 3600) // 60
-                        system_stats += f"  • Uptime: {uptime_days}д {uptime_hours}ч {uptime_minutes}м\n"
-                    
-                    stats_sections.append(system_stats)
-                
-            except Exception as e:
-                logger.error(f"Error getting system stats: {e}")
+    stats = await SystemAPI.get_stats()
+    if stats:
+        # CPU Information
+        cpu_cores = stats['cpu']['cores']
+        cpu_physical_cores = stats['cpu']['physicalCores']
         
-        # Статистика пользователей (если включена)
-        if DASHBOARD_SHOW_USERS_COUNT:
-            try:
-                users_response = await UserAPI.get_all_users()
-                users_count = 0
-                user_stats = {'ACTIVE': 0, 'DISABLED': 0, 'LIMITED': 0, 'EXPIRED': 0}
-                total_traffic = 0
-                
-                if users_response:
-                    users = []
-                    if isinstance(users_response, dict):
-                        if 'users' in users_response:
-                            users = users_response['users']
-                        elif 'response' in users_response and 'users' in users_response['response']:
-                            users = users_response['response']['users']
-                    elif isinstance(users_response, list):
-                        users = users_response
-                    
-                    users_count = len(users)
-                    
-                    for user in users:
-                        status = user.get('status', 'UNKNOWN')
-                        if status in user_stats:
-                            user_stats[status] += 1
-                        
-                        if DASHBOARD_SHOW_TRAFFIC_STATS:
-                            traffic_bytes = user.get('usedTrafficBytes', 0)
-                            if isinstance(traffic_bytes, (int, float)):
-                                total_traffic += traffic_bytes
-                            elif isinstance(traffic_bytes, str) and traffic_bytes.isdigit():
-                                total_traffic += int(traffic_bytes)
-                
-                user_section = f"👥 *Пользователи* ({users_count} всего):\n"
-                for status, count in user_stats.items():
-                    if count > 0:
-                        emoji = {"ACTIVE": "✅", "DISABLED": "❌", "LIMITED": "⚠️", "EXPIRED": "⏰"}.get(status, "❓")
-                        user_section += f"  • {emoji} {status}: {count}\n"
-                
-                if DASHBOARD_SHOW_TRAFFIC_STATS and total_traffic > 0:
-                    user_section += f"  • Общий трафик: {format_bytes(total_traffic)}\n"
-                
-                stats_sections.append(user_section)
-                
-            except Exception as e:
-                logger.error(f"Error getting user stats: {e}")
+        # Memory Information with correct calculation
+        total_mem = stats['memory']['total']
+        free_mem = stats['memory']['free']
+        available_mem = stats['memory'].get('available', free_mem)
         
-        # Статистика узлов (если включена)
-        if DASHBOARD_SHOW_NODES_COUNT:
-            try:
-                nodes_response = await NodeAPI.get_all_nodes()
-                nodes_count = 0
-                online_nodes = 0
-                
-                if nodes_response:
-                    nodes = []
-                    if isinstance(nodes_response, dict):
-                        if 'nodes' in nodes_response:
-                            nodes = nodes_response['nodes']
-                        elif 'response' in nodes_response and 'nodes' in nodes_response['response']:
-                            nodes = nodes_response['response']['nodes']
-                    elif isinstance(nodes_response, list):
-                        nodes = nodes_response
-                    
-                    nodes_count = len(nodes)
-                    online_nodes = sum(1 for node in nodes if node.get('isConnected'))
-                
-                node_section = f"🖥️ *Серверы*: {online_nodes}/{nodes_count} онлайн\n"
-                stats_sections.append(node_section)
-                
-            except Exception as e:
-                logger.error(f"Error getting node stats: {e}")
+        # Correct memory calculation for Linux systems
+        used_mem = total_mem - available_mem
+        used_percent = (used_mem / total_mem) * 100 if total_mem > 0 else 0
         
-        # Статистика трафика в реальном времени (если включена)
-        if DASHBOARD_SHOW_TRAFFIC_STATS:
-            try:
-                realtime_usage = await NodeAPI.get_nodes_realtime_usage()
-                if realtime_usage and len(realtime_usage) > 0:
-                    total_download_speed = 0
-                    total_upload_speed = 0
-                    total_download_bytes = 0
-                    total_upload_bytes = 0
-                    
-                    for node_data in realtime_usage:
-                        total_download_speed += node_data.get('downloadSpeedBps', 0)
-                        total_upload_speed += node_data.get('uploadSpeedBps', 0)
-                        total_download_bytes += node_data.get('downloadBytes', 0)
-                        total_upload_bytes += node_data.get('uploadBytes', 0)
-                    
-                    total_speed = total_download_speed + total_upload_speed
-                    total_bytes = total_download_bytes + total_upload_bytes
-                    
-                    if total_speed > 0 or total_bytes > 0:
-                        traffic_section = f"📊 *Текущая активность серверов*:\n"
-                        if total_speed > 0:
-                            traffic_section += f"  • Общая скорость: {format_bytes(total_speed)}/с\n"
-                            traffic_section += f"  • Скачивание: {format_bytes(total_download_speed)}/с\n"
-                            traffic_section += f"  • Загрузка: {format_bytes(total_upload_speed)}/с\n"
-                        if total_bytes > 0:
-                            traffic_section += f"  • Всего скачано: {format_bytes(total_download_bytes)}\n"
-                            traffic_section += f"  • Всего загружено: {format_bytes(total_upload_bytes)}\n"
-                        
-                        stats_sections.append(traffic_section)
-                        
-            except Exception as e:
-                logger.warning(f"Could not get realtime server stats: {e}")
+        system_stats = f"🖥️ *Система*:\n"
+        system_stats += f"  • CPU: {cpu_cores} ядер ({cpu_physical_cores} физ.)\n"
+        system_stats += f"  • RAM: {format_bytes(used_mem)} / {format_bytes(total_mem)} ({used_percent:.1f}%)\n"
         
-        # Информация о серверах (если включена)
-        if DASHBOARD_SHOW_SERVER_INFO:
-            try:
-                inbounds_response = await InboundAPI.get_inbounds()
-                inbounds_count = 0
-                
-                if inbounds_response:
-                    inbounds = []
-                    if isinstance(inbounds_response, dict):
-                        if 'inbounds' in inbounds_response:
-                            inbounds = inbounds_response['inbounds']
-                        elif 'response' in inbounds_response and 'inbounds' in inbounds_response['response']:
-                            inbounds = inbounds_response['response']['inbounds']
-                    elif isinstance(inbounds_response, list):
-                        inbounds = inbounds_response
-                    
-                    inbounds_count = len(inbounds)
-                
-                server_section = f"🔌 *Inbound'ы*: {inbounds_count} шт.\n"
-                stats_sections.append(server_section)
-                
-            except Exception as e:
-                logger.error(f"Error getting inbound stats: {e}")
+        if DASHBOARD_SHOW_UPTIME:
+            uptime_seconds = int(stats['uptime'])
+            uptime_days = uptime_seconds // (24 * 3600)
+            uptime_hours = (uptime_seconds % (24 * 3600)) // 3600
+            uptime_minutes = (uptime_seconds % 3600) // 60
+            system_stats += f"  • Uptime: {uptime_days}д {uptime_hours}ч {uptime_minutes}м\n"
+        
+        return system_stats
+
+    # Fallback to psutil if API fails
+    import psutil
+    from datetime import datetime
+    
+    cpu_cores = psutil.cpu_count()
+    cpu_physical_cores = psutil.cpu_count(logical=False)
+    memory = psutil.virtual_memory()
+    
+    system_stats = f"🖥️ *Система*:\n"
+    system_stats += f"  • CPU: {cpu_cores} ядер ({cpu_physical_cores} физ.)\n"
+    system_stats += f"  • RAM: {format_bytes(memory.used)} / {format_bytes(memory.total)} ({memory.percent:.1f}%)\n"
+    
+    if DASHBOARD_SHOW_UPTIME:
+        uptime_seconds = psutil.boot_time()
+        current_time = datetime.now().timestamp()
+        uptime = int(current_time - uptime_seconds)
+        uptime_days = uptime // (24 * 3600)
+        uptime_hours = (uptime % (24 * 3600)) // 3600
+        uptime_minutes = (uptime % 3600) // 60
+        system_stats += f"  • Uptime: {uptime_days}д {uptime_hours}ч {uptime_minutes}м\n"
+    
+    return system_stats
+
+
+async def _users_section():
+    """User counts by status and total traffic"""
+    totals = await get_user_totals()
+    user_stats = totals['stats']
+    total_traffic = totals['total_traffic']
+    
+    user_section = f"👥 *Пользователи* ({totals['count']} всего):\n"
+    for status, count in user_stats.items():
+        if count > 0:
+            emoji = {"ACTIVE": "✅", "DISABLED": "❌", "LIMITED": "⚠️", "EXPIRED": "⏰"}.get(status, "❓")
+            user_section += f"  • {emoji} {status}: {count}\n"
+    
+    if DASHBOARD_SHOW_TRAFFIC_STATS and total_traffic > 0:
+        user_section += f"  • Общий трафик: {format_bytes(total_traffic)}\n"
+    
+    return user_section
+
+
+async def _nodes_section():
+    """Online / total nodes"""
+    nodes_response = await NodeAPI.get_all_nodes()
+    nodes_count = 0
+    online_nodes = 0
+    
+    if nodes_response:
+        nodes = []
+        if isinstance(nodes_response, dict):
+            if 'nodes' in nodes_response:
+                nodes = nodes_response['nodes']
+            elif 'response' in nodes_response and 'nodes' in nodes_response['response']:
+                nodes = nodes_response['response']['nodes']
+        elif isinstance(nodes_response, list):
+            nodes = nodes_response
+        
+        nodes_count = len(nodes)
+        online_nodes = sum(1 for node in nodes if node.get('isConnected'))
+    
+    return f"🖥️ *Серверы*: {online_nodes}/{nodes_count} онлайн\n"
+
+
+async def _realtime_section():
+    """Current node throughput; empty when there is no activity"""
+    realtime_usage = await NodeAPI.get_nodes_realtime_usage()
+    if not realtime_usage:
+        return ""
+
+    total_download_speed = 0
+    total_upload_speed = 0
+    total_download_bytes = 0
+    total_upload_bytes = 0
+    
+    for node_data in realtime_usage:
+        total_download_speed += node_data.get('downloadSpeedBps', 0)
+        total_upload_speed += node_data.get('uploadSpeedBps', 0)
+        total_download_bytes += node_data.get('downloadBytes', 0)
+        total_upload_bytes += node_data.get('uploadBytes', 0)
+    
+    total_speed = total_download_speed + total_upload_speed
+    total_bytes = total_download_bytes + total_upload_bytes
+    
+    if total_speed <= 0 and total_bytes <= 0:
+        return ""
+
+    traffic_section = f"📊 *Текущая активность серверов*:\n"
+    if total_speed > 0:
+        traffic_section += f"  • Общая скорость: {format_bytes(total_speed)}/с\n"
+        traffic_section += f"  • Скачивание: {format_bytes(total_download_speed)}/с\n"
+        traffic_section += f"  • Загрузка: {format_bytes(total_upload_speed)}/с\n"
+    if total_bytes > 0:
+        traffic_section += f"  • Всего скачано: {format_bytes(total_download_bytes)}\n"
+        traffic_section += f"  • Всего загружено: {format_bytes(total_upload_bytes)}\n"
+    return traffic_section
+
+
+async def _inbounds_section():
+    """Inbounds count"""
+    inbounds_response = await InboundAPI.get_inbounds()
+    inbounds_count = 0
+    
+    if inbounds_response:
+        inbounds = []
+        if isinstance(inbounds_response, dict):
+            if 'inbounds' in inbounds_response:
+                inbounds = inbounds_response['inbounds']
+            elif 'response' in inbounds_response and 'inbounds' in inbounds_response['response']:
+                inbounds = inbounds_response['response']['inbounds']
+        elif isinstance(inbounds_response, list):
+            inbounds = inbounds_response
         
+        inbounds_count = len(inbounds)
+    
+    return f"🔌 *Inbound'ы*: {inbounds_count} шт.\n"
+
+
+# (ключ, заголовок для заглушки, включено ли, функция-источник) в порядке вывода
+DASHBOARD_SECTIONS = [
+    ("system", "🖥️ *Система*", DASHBOARD_SHOW_SYSTEM_STATS, _system_section),
+    ("users", "👥 *Пользователи*", DASHBOARD_SHOW_USERS_COUNT, _users_section),
+    ("nodes", "🖥️ *Серверы*", DASHBOARD_SHOW_NODES_COUNT, _nodes_section),
+    ("realtime", "📊 *Текущая активность серверов*", DASHBOARD_SHOW_TRAFFIC_STATS, _realtime_section),
+    ("inbounds", "🔌 *Inbound'ы*", DASHBOARD_SHOW_SERVER_INFO, _inbounds_section),
+]
+
+# Последний успешно построенный текст каждой секции и время его получения
+_last_sections: Dict[str, Tuple[str, float]] = {}
+# Начало последней завершившейся попытки построить секцию: текст старше нее — устаревший
+_section_attempts: Dict[str, float] = {}
+
+
+def _remember_section(key: str, task: asyncio.Task):
+    """Store a finished section, even if it completed after the dashboard timeout"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f"Error building dashboard section '{key}': {error}")
+        return
+    _last_sections[key] = (task.result(), time.monotonic())
+
+
+def _render_section(key: str, label: str) -> str:
+    """Section text from the cache; a value older than the last failed attempt shows its age"""
+    cached = _last_sections.get(key)
+    if cached is None:
+        return f"{label}: ⚠️ нет данных\n"
+    text, built_at = cached
+    if not text:
+        return ""
+    if built_at >= _section_attempts.get(key, built_at):
+        return text
+    age = int(time.monotonic() - built_at)
+    ago = f"{age // 60} мин назад" if age >= 60 else f"{age} сек назад"
+    return text + f"  • ⏳ Устаревшие данные ({ago})\n"
+
+
+async def _build_section(key: str, producer):
+    """Run one section producer with its own timeout; the result lands in _last_sections"""
+    started = time.monotonic()
+    task = asyncio.ensure_future(producer())
+    task.add_done_callback(lambda t: _remember_section(key, t))
+    try:
+        # shield: медленный запрос продолжает выполняться и обновит секцию для следующего показа
+        await asyncio.wait_for(asyncio.shield(task), DASHBOARD_SECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Dashboard section '{key}' timed out after {DASHBOARD_SECTION_TIMEOUT}s")
+    except Exception:
+        # Ошибка уже залогирована в _remember_section
+        pass
+    _section_attempts[key] = started
+
+
+async def refresh_dashboard_sections():
+    """Rebuild all enabled dashboard sections concurrently; failed ones keep their last value"""
+    # Время ответа определяется самой медленной секцией, а не суммой запросов
+    await asyncio.gather(*(
+        _build_section(key, producer)
+        for key, label, enabled, producer in DASHBOARD_SECTIONS if enabled
+    ))
+
+
+def render_dashboard_sections() -> list:
+    """Current text of all enabled sections, with ages computed at render time"""
+    sections = (_render_section(key, label) for key, label, enabled, producer in DASHBOARD_SECTIONS if enabled)
+    return [section for section in sections if section]
+
+
+async def build_dashboard_sections() -> list:
+    """Refresh and render all enabled dashboard sections"""
+    await refresh_dashboard_sections()
+    return render_dashboard_sections()
+
+
+# Когда фоновая задача последний раз обновила секции главного экрана (None — еще не обновляла)
+_dashboard_refreshed_at: Optional[float] = None
+
+
+async def refresh_dashboard_snapshot(context=None):
+    """JobQueue callback: rebuild dashboard sections in the background"""
+    global _dashboard_refreshed_at
+    if bot_is_idle(DASHBOARD_IDLE_TIMEOUT):
+        # Ботом никто не пользуется: панель не опрашиваем, устаревший снимок меню соберет заново
+        return
+    try:
+        await refresh_dashboard_sections()
+        _dashboard_refreshed_at = time.time()
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard snapshot: {e}")
+
+
+def start_dashboard_refresh(application):
+    """Schedule periodic dashboard snapshot refreshes"""
+    if DASHBOARD_REFRESH_INTERVAL <= 0:
+        logger.info("Dashboard snapshot disabled, main menu statistics are built on demand")
+        return
+    if application.job_queue is None:
+        logger.warning("JobQueue недоступна, статистика главного экрана будет собираться по запросу")
+        return
+    application.job_queue.run_repeating(
+        refresh_dashboard_snapshot,
+        interval=DASHBOARD_REFRESH_INTERVAL,
+        first=0,
+        name=DASHBOARD_JOB_NAME
+    )
+    logger.info(f"Dashboard snapshot refresh scheduled: interval={DASHBOARD_REFRESH_INTERVAL}s")
+
+
+async def get_system_stats():
+    """Get system statistics based on configuration settings"""
+    try:
+        # Состояние подключения к панели по данным health monitor
+        stats_sections = [circuit_breaker.status_line() + "\n"]
+
+        built_at = _dashboard_refreshed_at
+        # Снимок считается рабочим, пока фоновая задача не пропустила несколько обновлений подряд
+        if built_at is not None and time.time() - built_at <= DASHBOARD_REFRESH_INTERVAL * 3:
+            sections = render_dashboard_sections()
+        else:
+            sections, built_at = await build_dashboard_sections(), None
+        stats_sections.extend(sections)
+
         # Собираем все секции в одну строку
-        if stats_sections:
+        if len(stats_sections) > 1:
             result = "📈 *Системная статистика*\n\n" + "\n".join(stats_sections)
+            if built_at is not None:
+                result += f"\n🕒 Обновлено {int(time.time() - built_at)} сек назад\n"
         else:
             result = "📈 *Статистика*\n\nОтображение статистики отключено в настройках."
         
@@ -286,22 +378,9 @@ async def get_basic_system_stats():
     """Get basic system statistics (fallback version)"""
     try:
         # Получаем статистику пользователей
-        users_response = await UserAPI.get_all_users()
-        users_count = 0
-        active_users = 0
-        if users_response:
-            # Проверяем разные возможные структуры ответа
-            users = []
-            if isinstance(users_response, dict):
-                if 'users' in users_response:
-                    users = users_response['users']
-                elif 'response' in users_response and 'users' in users_response['response']:
-                    users = users_response['response']['users']
-            elif isinstance(users_response, list):
-                users = users_response
-            
-            users_count = len(users)
-            active_users = sum(1 for user in users if user.get('status') == 'ACTIVE')
+        totals = await get_user_totals()
+        users_count = totals['count']
+        active_users = totals['stats'].get('ACTIVE', 0)
 
         # Получаем статистику узлов
         nodes_response = await NodeAPI.get_all_nodes()
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 import logging
 
 from modules.config import MAIN_MENU, HOST_MENU, EDIT_HOST, EDIT_HOST_FIELD, HOST_PROFILE, HOST_INBOUND, HOST_PARAMS
-from modules.api.config_profiles import ConfigProfileAPI
+from modules.api.topology import topology_cache
 from modules.api.hosts import HostAPI
 from modules.utils.formatters import format_host_details
 from modules.handlers.core.start import show_main_menu
@@ -123,7 +123,7 @@ async def start_create_host(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start host creation wizard: choose config profile"""
     query = update.callback_query
     await query.answer()
-    profiles = await ConfigProfileAPI.get_profiles()
+    profiles = await topology_cache.get_profiles()
     if not profiles:
         await query.edit_message_text("❌ Не удалось получить список профилей.")
         return HOST_MENU
@@ -148,7 +148,7 @@ async def choose_host_inbound(update: Update, context: ContextTypes.DEFAULT_TYPE
     profile_uuid = ch.get("configProfileUuid")
     if not profile_uuid:
         return await start_create_host(update, context)
-    inbounds = await ConfigProfileAPI.get_profile_inbounds(profile_uuid)
+    inbounds = await topology_cache.get_profile_inbounds(profile_uuid)
     if not inbounds:
         await query.edit_message_text("❌ В профиле нет inbound'ов.")
         return HOST_MENU
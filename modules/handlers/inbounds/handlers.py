@@ -6,7 +6,7 @@ from datetime import datetime
 
 from modules.config import MAIN_MENU, INBOUND_MENU
 from modules.api.inbounds import InboundAPI
-from modules.api.users import UserAPI
+from modules.api.user_mirror import user_mirror
 from modules.api.nodes import NodeAPI
 from modules.utils.formatters import format_inbound_details, escape_markdown
 from modules.utils.selection_helpers import SelectionHelper
@@ -31,6 +31,8 @@ class InboundConstants:
         BACK_TO_INBOUNDS = "back_to_inbounds"
         BACK_TO_MAIN = "back_to_main"
     
+    FULL_INBOUNDS_PER_PAGE = 10
+
     class Messages:
         TITLE = "🔌 *Управление Inbounds*"
         LOADING = "🔄 Загрузка данных..."
@@ -216,59 +218,50 @@ async def debug_user_structure(update: Update, context: ContextTypes.DEFAULT_TYP
         await InboundAPI.debug_user_structure()
         
         # Get a sample user to show structure
-        users_response = await UserAPI.get_all_users()
-        if not users_response:
+        users = await user_mirror.get_users()
+        if not users:
             message = "❌ Не удалось получить данные пользователей для отладки"
         else:
-            users = []
-            if isinstance(users_response, dict) and 'users' in users_response:
-                users = users_response['users']
-            elif isinstance(users_response, list):
-                users = users_response
+            user = users[0]  # Get first user
+            message = f"🔍 *Структура данных пользователя*\n\n"
+            message += f"👤 *Пользователь*: {escape_markdown(user.get('username', 'N/A'))}\n"
+            message += f"📊 *Статус*: {user.get('status', 'N/A')}\n"
+            message += f"🆔 *UUID*: `{user.get('uuid', 'N/A')}`\n\n"
             
-            if not users:
-                message = "❌ Пользователи не найдены"
+            # Subscription info
+            subscription = user.get('subscription')
+            if subscription:
+                message += f"📋 *Подписка:*\n"
+                message += f"  • Статус: {subscription.get('status', 'N/A')}\n"
+                message += f"  • Config Profile UUID: `{subscription.get('configProfileUuid', 'N/A')}`\n"
+                message += f"  • Inbounds: {subscription.get('inbounds', 'N/A')}\n\n"
             else:
-                user = users[0]  # Get first user
-                message = f"🔍 *Структура данных пользователя*\n\n"
-                message += f"👤 *Пользователь*: {escape_markdown(user.get('username', 'N/A'))}\n"
-                message += f"📊 *Статус*: {user.get('status', 'N/A')}\n"
-                message += f"🆔 *UUID*: `{user.get('uuid', 'N/A')}`\n\n"
-                
-                # Subscription info
-                subscription = user.get('subscription')
-                if subscription:
-                    message += f"📋 *Подписка:*\n"
-                    message += f"  • Статус: {subscription.get('status', 'N/A')}\n"
-                    message += f"  • Config Profile UUID: `{subscription.get('configProfileUuid', 'N/A')}`\n"
-                    message += f"  • Inbounds: {subscription.get('inbounds', 'N/A')}\n\n"
-                else:
-                    message += f"📋 *Подписка*: Нет данных\n\n"
-                
-                # Direct inbound references
-                user_inbounds = user.get('inbounds', [])
-                if user_inbounds:
-                    message += f"🔌 *Прямые Inbounds*: {len(user_inbounds)} шт.\n"
-                    for i, inbound in enumerate(user_inbounds[:3]):
-                        message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
-                    if len(user_inbounds) > 3:
-                        message += f"  ... и еще {len(user_inbounds) - 3}\n"
-                else:
-                    message += f"🔌 *Прямые Inbounds*: Нет данных\n"
-                
-                # Active inbounds
-                active_inbounds = user.get('activeInbounds', [])
-                if active_inbounds:
-                    message += f"✅ *Активные Inbounds*: {len(active_inbounds)} шт.\n"
-                    for i, inbound in enumerate(active_inbounds[:3]):
-                        message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
-                    if len(active_inbounds) > 3:
-                        message += f"  ... и еще {len(active_inbounds) - 3}\n"
-                else:
-                    message += f"✅ *Активные Inbounds*: Нет данных\n"
-                
-                message += f"\n📝 *Проверьте логи для подробной информации*"
-        
+                message += f"📋 *Подписка*: Нет данных\n\n"
+            
+            # Direct inbound references
+            user_inbounds = user.get('inbounds', [])
+            if user_inbounds:
+                message += f"🔌 *Прямые Inbounds*: {len(user_inbounds)} шт.\n"
+                for i, inbound in enumerate(user_inbounds[:3]):
+                    message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
+                if len(user_inbounds) > 3:
+                    message += f"  ... и еще {len(user_inbounds) - 3}\n"
+            else:
+                message += f"🔌 *Прямые Inbounds*: Нет данных\n"
+            
+            # Active inbounds
+            active_inbounds = user.get('activeInbounds', [])
+            if active_inbounds:
+                message += f"✅ *Активные Inbounds*: {len(active_inbounds)} шт.\n"
+                for i, inbound in enumerate(active_inbounds[:3]):
+                    message += f"  {i+1}. {inbound.get('tag', 'N/A')} ({inbound.get('uuid', 'N/A')[:8]}...)\n"
+                if len(active_inbounds) > 3:
+                    message += f"  ... и еще {len(active_inbounds) - 3}\n"
+            else:
+                message += f"✅ *Активные Inbounds*: Нет данных\n"
+            
+            message += f"\n📝 *Проверьте логи для подробной информации*"
+    
         keyboard = [
             [InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)]
         ]
@@ -518,8 +511,6 @@ async def show_inbound_config(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def show_inbound_users(update: Update, context: ContextTypes.DEFAULT_TYPE, inbound: Dict[str, Any]):
     """Show online count for inbound (без списка пользователей)"""
-    from datetime import datetime
-    
     message = f"👥 *Пользователи Inbound*\n\n"
     message += f"🏷️ *Тег*: {escape_markdown(inbound['tag'])}\n"
     message += f"🔌 *Тип*: {inbound['type']}\n"
@@ -530,23 +521,14 @@ async def show_inbound_users(update: Update, context: ContextTypes.DEFAULT_TYPE,
         message += f"📡 *Онлайн сейчас*: {online_count}\n\n"
         
         # Получим общее количество активных пользователей
-        from modules.api.users import UserAPI
-        all_users_resp = await UserAPI.get_all_users()
-        all_users = []
-        if isinstance(all_users_resp, dict) and 'users' in all_users_resp:
-            all_users = all_users_resp['users'] or []
-        elif isinstance(all_users_resp, list):
-            all_users = all_users_resp
+        all_users = await user_mirror.get_users()
         
         active_users = 0
         for user in all_users:
             if InboundAPI._is_active_status(user.get('status')):
                 active_users += 1
         
-        message += f"📊 *Всего активных пользователей*: {active_users}\n\n"
-        # Добавим время обновления чтобы избежать ошибки "Message is not modified"
-        current_time = datetime.now().strftime("%H:%M:%S")
-        message += f"🕐 *Обновлено*: {current_time}\n"
+        message += f"📊 *Всего активных пользователей*: {active_users}\n"
     except Exception as e:
         logger.error(f"Error getting online count for inbound {inbound['uuid']}: {e}")
         message += f"❌ *Ошибка загрузки данных*\n"
@@ -733,14 +715,119 @@ async def list_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     return INBOUND_MENU
 
+async def _load_full_inbounds(context: ContextTypes.DEFAULT_TYPE) -> Optional[List[Dict[str, Any]]]:
+    """Fetch inbounds with batched user stats and keep them for pagination"""
+    inbounds = await InboundAPI.get_full_inbounds()
+    if not inbounds:
+        return None
+
+    # Статистика по всем инбаундам одним вызовом, без запросов на каждый inbound
+    try:
+        users_stats = await InboundAPI.get_inbounds_users_stats([inbound['uuid'] for inbound in inbounds])
+    except Exception as e:
+        logger.error(f"Error getting user stats for inbounds: {e}")
+        users_stats = {}
+
+    rows = []
+    for inbound in inbounds:
+        rows.append({
+            'uuid': inbound['uuid'],
+            'tag': inbound['tag'],
+            'type': inbound['type'],
+            'port': inbound['port'],
+            'enabled': inbound.get('enabled', True),
+            'nodes': inbound.get('nodes'),
+            'users': users_stats.get(inbound['uuid']),
+        })
+    context.user_data["full_inbounds"] = rows
+    return rows
+
+async def _render_full_inbounds(update: Update, rows: List[Dict[str, Any]], page: int):
+    """Render one page of the detailed inbound list from prepared rows"""
+    per_page = InboundConstants.FULL_INBOUNDS_PER_PAGE
+    total_pages = max((len(rows) + per_page - 1) // per_page, 1)
+    page = min(max(page, 0), total_pages - 1)
+
+    total_users = 0
+    total_nodes = 0
+    active_inbounds = 0
+    for row in rows:
+        if row['enabled']:
+            active_inbounds += 1
+        if row['users']:
+            total_users += row['users']['total']
+        if row['nodes']:
+            total_nodes += row['nodes'].get('enabled', 0) + row['nodes'].get('disabled', 0)
+
+    # Create enhanced keyboard with detailed information
+    keyboard = []
+    for row in rows[page * per_page:(page + 1) * per_page]:
+        # Status indicator
+        status_emoji = "🟢" if row['enabled'] else "🔴"
+        user_stats = row['users']
+        user_info = f"👥 {user_stats['enabled']}/{user_stats['total']}" if user_stats else "👥 ?/?"
+
+        node_info = ""
+        if row['nodes']:
+            enabled_nodes = row['nodes'].get('enabled', 0)
+            disabled_nodes = row['nodes'].get('disabled', 0)
+            node_info = f"🖥️ {enabled_nodes}/{enabled_nodes + disabled_nodes}"
+
+        # Create detailed button text
+        button_parts = [f"{status_emoji} {row['tag']}"]
+        button_parts.append(f"{row['type']}:{row['port']}")
+        button_parts.append(user_info)
+        if node_info:
+            button_parts.append(node_info)
+
+        button_text = " | ".join(button_parts)
+        callback_data = f"select_full_inbound_{row['uuid']}"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
+
+    if total_pages > 1:
+        pagination_row = []
+        if page > 0:
+            pagination_row.append(InlineKeyboardButton("⬅️", callback_data=f"page_full_inbounds_{page - 1}"))
+        pagination_row.append(InlineKeyboardButton(f"{page + 1}/{total_pages}", callback_data="page_info"))
+        if page < total_pages - 1:
+            pagination_row.append(InlineKeyboardButton("➡️", callback_data=f"page_full_inbounds_{page + 1}"))
+        keyboard.append(pagination_row)
+
+    # Add back button
+    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)])
+
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    # Create enhanced message with comprehensive statistics
+    message = f"🔌 *Детальный список Inbounds* ({len(rows)} шт.)\n\n"
+    message += f"📊 *Общая статистика:*\n"
+    message += f"  • Активных: {active_inbounds}\n"
+    message += f"  • Отключенных: {len(rows) - active_inbounds}\n"
+    message += f"  • Пользователей: {total_users}\n"
+    message += f"  • Серверов: {total_nodes}\n\n"
+
+    message += f"📋 *Легенда:*\n"
+    message += f"  🟢 - Активный inbound\n"
+    message += f"  🔴 - Отключенный inbound\n"
+    message += f"  👥 - Пользователи (активные/всего)\n"
+    message += f"  🖥️ - Серверы (активные/всего)\n\n"
+
+    message += f"Выберите Inbound для просмотра подробной информации:"
+
+    await update.callback_query.edit_message_text(
+        text=message,
+        reply_markup=reply_markup,
+        parse_mode="Markdown"
+    )
+
 async def list_full_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List all inbounds with enhanced full details display"""
     await update.callback_query.edit_message_text(InboundConstants.Messages.LOADING)
 
     try:
-        inbounds = await InboundAPI.get_full_inbounds()
+        rows = await _load_full_inbounds(context)
 
-        if not inbounds:
+        if not rows:
             keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -750,74 +837,7 @@ async def list_full_inbounds(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
             return INBOUND_MENU
 
-        # Create enhanced keyboard with detailed information
-        keyboard = []
-        total_users = 0
-        total_nodes = 0
-        active_inbounds = 0
-        
-        for inbound in inbounds:
-            # Status indicator
-            status_emoji = "🟢" if inbound.get('enabled', True) else "🔴"
-            if inbound.get('enabled', True):
-                active_inbounds += 1
-            
-            # Get real user statistics from API
-            try:
-                user_stats = await InboundAPI.get_inbound_users_stats(inbound['uuid'])
-                user_info = f"👥 {user_stats['enabled']}/{user_stats['total']}"
-                total_users += user_stats['total']
-            except Exception as e:
-                logger.error(f"Error getting user stats for inbound {inbound['uuid']}: {e}")
-                user_info = "👥 ?/?"
-            
-            # Node statistics (keep existing logic for now)
-            node_info = ""
-            if 'nodes' in inbound:
-                nodes = inbound['nodes']
-                enabled_nodes = nodes.get('enabled', 0)
-                disabled_nodes = nodes.get('disabled', 0)
-                total_nodes += enabled_nodes + disabled_nodes
-                node_info = f"🖥️ {enabled_nodes}/{enabled_nodes + disabled_nodes}"
-            
-            # Create detailed button text
-            button_parts = [f"{status_emoji} {inbound['tag']}"]
-            button_parts.append(f"{inbound['type']}:{inbound['port']}")
-            if user_info:
-                button_parts.append(user_info)
-            if node_info:
-                button_parts.append(node_info)
-            
-            button_text = " | ".join(button_parts)
-            callback_data = f"select_full_inbound_{inbound['uuid']}"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
-        
-        # Add back button
-        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data=InboundConstants.CallbackData.BACK_TO_INBOUNDS)])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        # Create enhanced message with comprehensive statistics
-        message = f"🔌 *Детальный список Inbounds* ({len(inbounds)} шт.)\n\n"
-        message += f"📊 *Общая статистика:*\n"
-        message += f"  • Активных: {active_inbounds}\n"
-        message += f"  • Отключенных: {len(inbounds) - active_inbounds}\n"
-        message += f"  • Пользователей: {total_users}\n"
-        message += f"  • Серверов: {total_nodes}\n\n"
-        
-        message += f"📋 *Легенда:*\n"
-        message += f"  🟢 - Активный inbound\n"
-        message += f"  🔴 - Отключенный inbound\n"
-        message += f"  👥 - Пользователи (активные/всего)\n"
-        message += f"  🖥️ - Серверы (активные/всего)\n\n"
-        
-        message += f"Выберите Inbound для просмотра подробной информации:"
-
-        await update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
+        await _render_full_inbounds(update, rows, page=0)
 
     except Exception as e:
         logger.error(f"Error listing full inbounds: {e}")
@@ -979,9 +999,10 @@ async def handle_inbound_pagination(update: Update, context: ContextTypes.DEFAUL
 async def handle_full_inbound_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int):
     """Handle pagination for full inbound list"""
     try:
-        inbounds = await InboundAPI.get_full_inbounds()
+        # Страницы строятся из сохраненного списка; загружаем заново только если его нет
+        rows = context.user_data.get("full_inbounds") or await _load_full_inbounds(context)
         
-        if not inbounds:
+        if not rows:
             keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_inbounds")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -991,40 +1012,7 @@ async def handle_full_inbound_pagination(update: Update, context: ContextTypes.D
             )
             return INBOUND_MENU
 
-        # Format items for SelectionHelper with detailed info
-        items = []
-        for inbound in inbounds:
-            description = f"🔌 {inbound['type']} | 🔢 Порт: {inbound['port']}"
-            
-            if 'users' in inbound:
-                description += f"\n👥 Пользователи: {inbound['users']['enabled']} активных, {inbound['users']['disabled']} отключенных"
-            
-            if 'nodes' in inbound:
-                description += f"\n🖥️ Серверы: {inbound['nodes']['enabled']} активных, {inbound['nodes']['disabled']} отключенных"
-            
-            items.append({
-                'id': inbound['uuid'],
-                'name': inbound['tag'],
-                'description': description
-            })
-
-        # Use SelectionHelper for pagination
-        helper = SelectionHelper(
-            title="🔌 Выберите Inbound (детальный просмотр)",
-            items=items,
-            callback_prefix="select_full_inbound",
-            back_callback="back_to_inbounds",
-            items_per_page=6
-        )
-
-        keyboard = helper.get_keyboard(page=page)
-        message = helper.get_message(page=page)
-
-        await update.callback_query.edit_message_text(
-            text=message,
-            reply_markup=keyboard,
-            parse_mode="Markdown"
-        )
+        await _render_full_inbounds(update, rows, page)
 
     except Exception as e:
         logger.error(f"Error handling full inbound pagination: {e}")
@@ -1037,5 +1025,3 @@ async def handle_full_inbound_pagination(update: Update, context: ContextTypes.D
         )
 
     return INBOUND_MENU
-
-
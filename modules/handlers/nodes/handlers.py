@@ -4,8 +4,7 @@ import logging
 
 from modules.config import MAIN_MENU, NODE_MENU, EDIT_NODE, EDIT_NODE_FIELD, CREATE_NODE, NODE_NAME, NODE_ADDRESS, NODE_PORT, NODE_TLS, SELECT_INBOUNDS
 from modules.api.nodes import NodeAPI
-from modules.api.inbounds import InboundAPI
-from modules.api.config_profiles import ConfigProfileAPI
+from modules.api.topology import topology_cache
 from modules.utils.formatters import format_node_details, format_bytes
 from modules.utils.selection_helpers import SelectionHelper
 from modules.handlers.core.start import show_main_menu
@@ -1108,8 +1107,8 @@ async def show_inbound_exclusion(update: Update, context: ContextTypes.DEFAULT_T
     try:
         node_data = context.user_data.get("create_node", {})
         
-        # Get all available inbounds (v208 via config profiles)
-        inbounds = await InboundAPI.get_inbounds()
+        # Get all available inbounds (v208 via config profiles, from the topology cache)
+        inbounds = await topology_cache.get_inbounds()
         
         # Initialize selectedInbounds list if not set
         if "selectedInbounds" not in node_data or node_data["selectedInbounds"] is None:
@@ -1203,7 +1202,7 @@ async def create_node_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         active_profile_uuid = node_data.get("activeConfigProfileUuid")
         if not active_profile_uuid:
             try:
-                profiles = await ConfigProfileAPI.get_profiles()
+                profiles = await topology_cache.get_profiles()
                 if profiles and isinstance(profiles, list):
                     active_profile_uuid = profiles[0].get("uuid")
                     node_data["activeConfigProfileUuid"] = active_profile_uuid
@@ -1214,7 +1213,7 @@ async def create_node_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         selected_inbounds = node_data.get("selectedInbounds", [])
         if active_profile_uuid and selected_inbounds:
             try:
-                all_inbounds = await InboundAPI.get_inbounds()
+                all_inbounds = await topology_cache.get_inbounds()
                 inbound_profile_map = {i.get("uuid"): i.get("profileUuid") for i in (all_inbounds or [])}
                 selected_inbounds = [iid for iid in selected_inbounds if inbound_profile_map.get(iid) == active_profile_uuid]
             except Exception:
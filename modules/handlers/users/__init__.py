@@ -1 +1,2 @@
 from .handlers import *  # noqa: F401,F403
+from .inline import *  # noqa: F401,F403
@@ -99,9 +99,13 @@ class Messages:
     CONFIRM_RESET = "⚠️ Вы уверены, что хотите сбросить трафик пользователя?"
     CONFIRM_REVOKE = "⚠️ Вы уверены, что хотите отозвать подписку пользователя?"
 from modules.api.users import UserAPI
+from modules.api.bulk import BulkAPI, execute_chunked
+from modules.api.user_mirror import user_mirror
+from modules.api.user_index import search_users
 from modules.api.squads import SquadAPI
 from modules.utils.formatters import format_bytes, format_user_details, format_user_details_safe, escape_markdown, safe_edit_message
 from modules.utils.selection_helpers import SelectionHelper
+from modules.utils.callback_registry import CallbackRouter, callback_registry
 from modules.utils.auth import (
     check_admin,
     check_authorization,
@@ -291,6 +295,7 @@ class UserCache:
                     'data': user_data,
                     'timestamp': datetime.now().timestamp()
                 }
+                user_mirror.upsert(user_data)
                 logger.debug(f"User {uuid} cached")
             return user_data
         except Exception as e:
@@ -298,38 +303,9 @@ class UserCache:
             return None
     
     async def get_all_users(self) -> Optional[list]:
-        """Получает всех пользователей из кэша или API"""
-        cache_key = "all_users"
-        
-        if cache_key in self._cache:
-            cached_data = self._cache[cache_key]
-            if not self._is_expired(cached_data['timestamp']):
-                logger.debug("All users found in cache")
-                return cached_data['data']
-            else:
-                del self._cache[cache_key]
-        
-        # Получаем данные из API
+        """Получает всех пользователей из локального зеркала"""
         try:
-            response = await UserAPI.get_all_users()
-            users = []
-            
-            if isinstance(response, dict):
-                if 'users' in response:
-                    users = response['users'] or []
-                elif 'response' in response and isinstance(response['response'], dict) and 'users' in response['response']:
-                    users = response['response']['users'] or []
-            elif isinstance(response, list):
-                users = response
-            
-            if users:
-                self._cache[cache_key] = {
-                    'data': users,
-                    'timestamp': datetime.now().timestamp()
-                }
-                logger.debug(f"Cached {len(users)} users")
-            
-            return users
+            return await user_mirror.get_users()
         except Exception as e:
             logger.error(f"Error fetching all users: {e}")
             return None
@@ -500,55 +476,47 @@ class BulkOperations:
     """Класс для массовых операций с пользователями"""
     
     @staticmethod
-    async def bulk_disable_users(uuids: list[str]) -> Dict[str, bool]:
-        """Массовое отключение пользователей"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.disable_user(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error disabling user {uuid}: {e}")
-                results[uuid] = False
-        
+    def _invalidate_successful(results: Dict[str, bool]) -> Dict[str, bool]:
+        for uuid, success in results.items():
+            if success:
+                user_cache.invalidate_user(uuid)
         return results
     
     @staticmethod
-    async def bulk_enable_users(uuids: list[str]) -> Dict[str, bool]:
+    async def bulk_disable_users(uuids: list[str], on_progress=None, cancel_event=None) -> Dict[str, bool]:
+        """Массовое отключение пользователей"""
+        results = await execute_chunked(
+            uuids,
+            lambda chunk: BulkAPI.bulk_update_users(chunk, {"status": "DISABLED"}),
+            fallback=UserAPI.disable_user,
+            on_progress=on_progress,
+            cancel_event=cancel_event
+        )
+        return BulkOperations._invalidate_successful(results)
+    
+    @staticmethod
+    async def bulk_enable_users(uuids: list[str], on_progress=None, cancel_event=None) -> Dict[str, bool]:
         """Массовое включение пользователей"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.enable_user(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error enabling user {uuid}: {e}")
-                results[uuid] = False
-        
-        return results
+        results = await execute_chunked(
+            uuids,
+            lambda chunk: BulkAPI.bulk_update_users(chunk, {"status": "ACTIVE"}),
+            fallback=UserAPI.enable_user,
+            on_progress=on_progress,
+            cancel_event=cancel_event
+        )
+        return BulkOperations._invalidate_successful(results)
     
     @staticmethod
-    async def bulk_reset_traffic(uuids: list[str]) -> Dict[str, bool]:
+    async def bulk_reset_traffic(uuids: list[str], on_progress=None, cancel_event=None) -> Dict[str, bool]:
         """Массовый сброс трафика"""
-        results = {}
-        
-        for uuid in uuids:
-            try:
-                result = await UserAPI.reset_user_traffic(uuid)
-                results[uuid] = result
-                if result:
-                    user_cache.invalidate_user(uuid)
-            except Exception as e:
-                logger.error(f"Error resetting traffic for user {uuid}: {e}")
-                results[uuid] = False
-        
-        return results
+        results = await execute_chunked(
+            uuids,
+            BulkAPI.bulk_reset_user_traffic,
+            fallback=UserAPI.reset_user_traffic,
+            on_progress=on_progress,
+            cancel_event=cancel_event
+        )
+        return BulkOperations._invalidate_successful(results)
     
     @staticmethod
     def format_bulk_results(results: Dict[str, bool], operation: str) -> str:
@@ -721,43 +689,13 @@ async def handle_users_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return USER_MENU
 
 async def search_users_by_term(term: str):
-    """Fetch users and filter by generic term"""
+    """Search users by generic term via the in-memory index"""
     try:
-        users = await user_cache.get_all_users()
-        if not users:
-            return []
+        return await search_users(term)
     except Exception as e:
-        logger.error(f"Error fetching users for search: {e}")
+        logger.error(f"Error searching users: {e}")
         return []
 
-    term_lower = term.lower()
-    matches = []
-    seen = set()
-
-    for user in users:
-        if not isinstance(user, dict):
-            continue
-        user_uuid = str(user.get('uuid') or '')
-        if not user_uuid or user_uuid in seen:
-            continue
-
-        fields = [
-            str(user.get('username') or ''),
-            str(user.get('description') or ''),
-            str(user.get('email') or ''),
-            str(user.get('tag') or ''),
-            str(user.get('shortUuid') or ''),
-            user_uuid,
-            str(user.get('telegramId') or '')
-        ]
-
-        if any(term_lower in field.lower() for field in fields if field):
-            matches.append(user)
-            seen.add(user_uuid)
-
-    matches.sort(key=lambda u: (u.get('username') or '').lower())
-    return matches
-
 
 async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """List all users with improved selection interface"""
@@ -781,8 +719,8 @@ async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return USER_MENU
 
-        # Store users data for later use
-        context.user_data["users_data"] = users_data
+        # Store only UUIDs of the page; records stay in the shared mirror
+        context.user_data["users_data"] = list(users_data)
         
         message = f"👥 *Список пользователей* ({len(users_data)} шт.)\n\n"
         message += "Выберите пользователя для просмотра подробной информации:"
@@ -928,7 +866,7 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
                 page=page
             )
             
-            context.user_data["users_data"] = users_data
+            context.user_data["users_data"] = list(users_data)
             
             message = f"👥 *Список пользователей* ({len(users_data)} шт.) - страница {page + 1}\n\n"
             message += "Выберите пользователя для просмотра подробной информации:"
@@ -997,7 +935,8 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
     if not user:
         keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_users")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.callback_query.edit_message_text(
+        send = update.callback_query.edit_message_text if update.callback_query else update.message.reply_text
+        await send(
             "❌ Пользователь не найден или ошибка при получении данных.",
             reply_markup=reply_markup
         )
@@ -1012,6 +951,12 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
 
     keyboard = SelectionHelper.create_user_info_keyboard(uuid, action_prefix="user_action", is_admin=context.user_data.get('is_admin', False))
 
+    if not update.callback_query:
+        # Открытие по ссылке (/start u_<uuid>) — новое сообщение вместо правки
+        await update.message.reply_text(text=message, reply_markup=keyboard)
+        context.user_data["current_user"] = user
+        return SELECTING_USER
+
     try:
         await update.callback_query.edit_message_text(
             text=message,
@@ -1031,6 +976,35 @@ async def show_user_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
     context.user_data["current_user"] = user
     return SELECTING_USER
 
+# Подтверждения простых действий: текст кнопки и вопрос
+ACTION_CONFIRMATIONS = {
+    "disable": ("✅ Да, отключить", Messages.CONFIRM_DISABLE),
+    "enable": ("✅ Да, включить", Messages.CONFIRM_ENABLE),
+    "reset": ("✅ Да, сбросить", Messages.CONFIRM_RESET),
+    "revoke": ("✅ Да, отозвать", Messages.CONFIRM_REVOKE),
+}
+
+async def ask_action_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str, uuid: str):
+    """Ask to confirm disable/enable/reset/revoke; handle_action_confirmation runs it"""
+    context.user_data["action"] = action
+    context.user_data["uuid"] = uuid
+
+    button_text, question = ACTION_CONFIRMATIONS[action]
+    keyboard = [
+        [
+            InlineKeyboardButton(button_text, callback_data="confirm_action"),
+            InlineKeyboardButton("❌ Отмена", callback_data=callback_registry.token("view", uuid))
+        ]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+
+    await update.callback_query.edit_message_text(
+        f"{question}\n\nUUID: `{uuid}`",
+        reply_markup=reply_markup,
+        parse_mode="Markdown"
+    )
+    return CONFIRM_ACTION
+
 async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle user action with improved SelectionHelper support"""
     # Проверяем авторизацию
@@ -1065,78 +1039,10 @@ async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
             elif action == "refresh":
                 await show_user_details(update, context, uuid)
                 return SELECTING_USER
-            elif action == "disable":
-                context.user_data["action"] = "disable"
-                context.user_data["uuid"] = uuid
-                
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Да, отключить", callback_data="confirm_action"),
-                        InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
-                    f"⚠️ Вы уверены, что хотите отключить пользователя?\n\nUUID: `{uuid}`",
-                    reply_markup=reply_markup,
-                    parse_mode="Markdown"
-                )
-                return CONFIRM_ACTION
-            elif action == "enable":
-                context.user_data["action"] = "enable"
-                context.user_data["uuid"] = uuid
-                
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Да, включить", callback_data="confirm_action"),
-                        InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
-                    f"⚠️ Вы уверены, что хотите включить пользователя?\n\nUUID: `{uuid}`",
-                    reply_markup=reply_markup,
-                    parse_mode="Markdown"
-                )
-                return CONFIRM_ACTION
             elif action == "reset" and len(action_parts) >= 5 and action_parts[3] == "traffic":
-                context.user_data["action"] = "reset"
-                context.user_data["uuid"] = "_".join(action_parts[4:])
-                
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Да, сбросить", callback_data="confirm_action"),
-                        InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
-                    f"⚠️ Вы уверены, что хотите сбросить трафик пользователя?\n\nUUID: `{uuid}`",
-                    reply_markup=reply_markup,
-                    parse_mode="Markdown"
-                )
-                return CONFIRM_ACTION
-            elif action == "revoke":
-                context.user_data["action"] = "revoke"
-                context.user_data["uuid"] = uuid
-                
-                keyboard = [
-                    [
-                        InlineKeyboardButton("✅ Да, отозвать", callback_data="confirm_action"),
-                        InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-                    ]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
-                    f"⚠️ Вы уверены, что хотите отозвать подписку пользователя?\n\nUUID: `{uuid}`",
-                    reply_markup=reply_markup,
-                    parse_mode="Markdown"
-                )
-                return CONFIRM_ACTION
+                return await ask_action_confirmation(update, context, "reset", "_".join(action_parts[4:]))
+            elif action in ("disable", "enable", "revoke"):
+                return await ask_action_confirmation(update, context, action, uuid)
             elif action == "delete":
                 # Confirm user deletion with extra protection
                 await confirm_delete_user(update, context, uuid)
@@ -1156,85 +1062,9 @@ async def handle_user_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await show_users_menu(update, context)
         return USER_MENU
 
-    elif data.startswith("disable_"):
-        uuid = data.split("_")[1]
-        context.user_data["action"] = "disable"
-        context.user_data["uuid"] = uuid
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, отключить", callback_data="confirm_action"),
-                InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            f"⚠️ Вы уверены, что хотите отключить пользователя?\n\nUUID: `{uuid}`",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
-        return CONFIRM_ACTION
-
-    elif data.startswith("enable_"):
-        uuid = data.split("_")[1]
-        context.user_data["action"] = "enable"
-        context.user_data["uuid"] = uuid
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, включить", callback_data="confirm_action"),
-                InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            f"⚠️ Вы уверены, что хотите включить пользователя?\n\nUUID: `{uuid}`",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
-        return CONFIRM_ACTION
-
-    elif data.startswith("reset_"):
-        uuid = data.split("_")[1]
-        context.user_data["action"] = "reset"
-        context.user_data["uuid"] = uuid
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, сбросить", callback_data="confirm_action"),
-                InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            f"⚠️ Вы уверены, что хотите сбросить трафик пользователя?\n\nUUID: `{uuid}`",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
-        return CONFIRM_ACTION
-
-    elif data.startswith("revoke_"):
-        uuid = data.split("_")[1]
-        context.user_data["action"] = "revoke"
-        context.user_data["uuid"] = uuid
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да, отозвать", callback_data="confirm_action"),
-                InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            f"⚠️ Вы уверены, что хотите отозвать подписку пользователя?\n\nUUID: `{uuid}`",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
-        )
-        return CONFIRM_ACTION
+    elif data.startswith(("disable_", "enable_", "reset_", "revoke_")):
+        action, uuid = data.split("_")[:2]
+        return await ask_action_confirmation(update, context, action, uuid)
 
     elif data.startswith("edit_"):
         uuid = data.split("_")[1]
@@ -1294,7 +1124,7 @@ async def handle_action_confirmation(update: Update, context: ContextTypes.DEFAU
         
         if result:
             keyboard = [
-                [InlineKeyboardButton("👁️ Просмотр пользователя", callback_data=f"view_{uuid}")],
+                [InlineKeyboardButton("👁️ Просмотр пользователя", callback_data=callback_registry.token("view", uuid))],
                 [InlineKeyboardButton("🔙 Назад к списку", callback_data="back_to_list")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -1306,7 +1136,7 @@ async def handle_action_confirmation(update: Update, context: ContextTypes.DEFAU
             )
         else:
             keyboard = [
-                [InlineKeyboardButton("🔙 Назад", callback_data=f"view_{uuid}")]
+                [InlineKeyboardButton("🔙 Назад", callback_data=callback_registry.token("view", uuid))]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
@@ -1374,7 +1204,8 @@ async def handle_text_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return USER_MENU
 
         if len(matches) == 1:
-            user = matches[0]
+            # Mirror records hold only list fields; the card needs the full user
+            user = await user_cache.get_user(matches[0]['uuid']) or matches[0].to_dict()
             try:
                 message = format_user_details_safe(user)
 
@@ -2835,8 +2666,8 @@ async def show_user_hwid_devices(update: Update, context: ContextTypes.DEFAULT_T
     
     if not devices:
         keyboard = [
-            [InlineKeyboardButton("➕ Добавить устройство", callback_data=f"add_hwid_{uuid}")],
-            [InlineKeyboardButton("🔙 Назад", callback_data=f"view_{uuid}")]
+            [InlineKeyboardButton("➕ Добавить устройство", callback_data=callback_registry.token("add_hwid", uuid))],
+            [InlineKeyboardButton("🔙 Назад", callback_data=callback_registry.token("view", uuid))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
@@ -2864,14 +2695,14 @@ async def show_user_hwid_devices(update: Update, context: ContextTypes.DEFAULT_T
     
     # Add action buttons
     keyboard = [
-        [InlineKeyboardButton("➕ Добавить устройство", callback_data=f"add_hwid_{uuid}")],
-        [InlineKeyboardButton("🔙 Назад к пользователю", callback_data=f"view_{uuid}")]
+        [InlineKeyboardButton("➕ Добавить устройство", callback_data=callback_registry.token("add_hwid", uuid))],
+        [InlineKeyboardButton("🔙 Назад к пользователю", callback_data=callback_registry.token("view", uuid))]
     ]
     
     # Add delete buttons for each device
     for i, device in enumerate(devices):
         keyboard.append([
-            InlineKeyboardButton(f"❌ Удалить {i+1}", callback_data=f"del_hwid_{uuid}_{device['hwid']}")
+            InlineKeyboardButton(f"❌ Удалить {i+1}", callback_data=callback_registry.token("del_hwid", uuid, device['hwid']))
         ])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2895,7 +2726,7 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     usage = await UserAPI.get_user_usage_by_range(uuid, start_date, end_date)
     
     if not usage:
-        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data=f"view_{uuid}")]]
+        keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data=callback_registry.token("view", uuid))]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.callback_query.edit_message_text(
@@ -2945,8 +2776,8 @@ async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE, uu
     
     # Add action buttons
     keyboard = [
-        [InlineKeyboardButton("🔙 Назад к пользователю", callback_data=f"view_{uuid}")],
-        [InlineKeyboardButton("🔄 Обновить статистику", callback_data=f"stats_{uuid}")]
+        [InlineKeyboardButton("🔙 Назад к пользователю", callback_data=callback_registry.token("view", uuid))],
+        [InlineKeyboardButton("🔄 Обновить статистику", callback_data=callback_registry.token("stats", uuid))]
     ]
     
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -2965,7 +2796,7 @@ async def start_add_hwid(update: Update, context: ContextTypes.DEFAULT_TYPE, uui
     
     context.user_data["add_hwid_uuid"] = uuid
     
-    keyboard = [[InlineKeyboardButton("🔙 Отмена", callback_data=f"hwid_{uuid}")]]
+    keyboard = [[InlineKeyboardButton("🔙 Отмена", callback_data=callback_registry.token("hwid", uuid))]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await update.callback_query.edit_message_text(
@@ -2985,8 +2816,8 @@ async def delete_hwid_device(update: Update, context: ContextTypes.DEFAULT_TYPE,
     # Confirm deletion
     keyboard = [
         [
-            InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_del_hwid_{uuid}_{hwid}"),
-            InlineKeyboardButton("❌ Отмена", callback_data=f"hwid_{uuid}")
+            InlineKeyboardButton("✅ Да, удалить", callback_data=callback_registry.token("confirm_del_hwid", uuid, hwid)),
+            InlineKeyboardButton("❌ Отмена", callback_data=callback_registry.token("hwid", uuid))
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -3010,7 +2841,7 @@ async def confirm_delete_hwid_device(update: Update, context: ContextTypes.DEFAU
     else:
         message = f"❌ Не удалось удалить устройство с HWID `{hwid}`."
     
-    keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=f"hwid_{uuid}")]]
+    keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=callback_registry.token("hwid", uuid))]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await update.callback_query.edit_message_text(
@@ -3034,7 +2865,7 @@ async def handle_hwid_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     result = await UserAPI.add_user_hwid_device(uuid, hwid)
     
     if result:
-        keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=f"hwid_{uuid}")]]
+        keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=callback_registry.token("hwid", uuid))]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.message.reply_text(
@@ -3043,7 +2874,7 @@ async def handle_hwid_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
     else:
-        keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=f"hwid_{uuid}")]]
+        keyboard = [[InlineKeyboardButton("🔙 Назад к устройствам", callback_data=callback_registry.token("hwid", uuid))]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
         await update.message.reply_text(
@@ -3094,7 +2925,7 @@ async def confirm_delete_user(update: Update, context: ContextTypes.DEFAULT_TYPE
 
         keyboard = [
             [InlineKeyboardButton("🗑️ Да, удалить навсегда", callback_data="final_delete_user")],
-            [InlineKeyboardButton("❌ Отмена", callback_data=f"view_{uuid}")]
+            [InlineKeyboardButton("❌ Отмена", callback_data=callback_registry.token("view", uuid))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -3800,3 +3631,68 @@ async def handle_cancel_user_creation(update: Update, context: ContextTypes.DEFA
     # Возвращаемся в меню пользователей
     await show_users_menu(update, context)
     return USER_MENU
+
+
+# Действия по токенам callback_data: (обработчик, только для администраторов)
+def _card_action(handler, admin_only: bool = True):
+    """Wrap a handler taking (update, context, *args) for the callback router: auth, answer, role"""
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args):
+        query = update.callback_query
+        if not check_authorization(update.effective_user):
+            await query.answer(Messages.NOT_AUTHORIZED, show_alert=True)
+            return ConversationHandler.END
+        if admin_only:
+            if 'is_admin' not in context.user_data:
+                context.user_data['is_admin'] = is_admin_user(update.effective_user.id) if update.effective_user else False
+            if not context.user_data['is_admin']:
+                await query.answer(INSUFFICIENT_PERMISSIONS_MESSAGE, show_alert=True)
+                return SELECTING_USER
+        await query.answer()
+        return await handler(update, context, *args)
+    return wrapper
+
+def _confirmation(action: str):
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE, uuid: str):
+        return await ask_action_confirmation(update, context, action, uuid)
+    return handler
+
+USER_CALLBACK_ACTIONS = {
+    "select_user": _card_action(show_user_details, admin_only=False),
+    "view": _card_action(show_user_details, admin_only=False),
+    "user_action_refresh": _card_action(show_user_details, admin_only=False),
+    "stats": _card_action(show_user_stats, admin_only=False),
+    "user_action_edit": _card_action(start_edit_user),
+    "user_action_disable": _card_action(_confirmation("disable")),
+    "user_action_enable": _card_action(_confirmation("enable")),
+    "user_action_reset_traffic": _card_action(_confirmation("reset")),
+    "user_action_revoke": _card_action(_confirmation("revoke")),
+    "user_action_delete": _card_action(confirm_delete_user),
+    "hwid": _card_action(show_user_hwid_devices),
+    "add_hwid": _card_action(start_add_hwid),
+    "del_hwid": _card_action(delete_hwid_device),
+    "confirm_del_hwid": _card_action(confirm_delete_hwid_device),
+}
+
+async def handle_expired_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Button of a message sent before a restart or too long ago: reopen the users menu"""
+    await update.callback_query.answer("⌛ Кнопка устарела, откройте пользователя заново.", show_alert=True)
+    await show_users_menu(update, context)
+    return USER_MENU
+
+# Карточка пользователя, устройства HWID, статистика; старые callback_data — по первому слову
+selecting_user_callbacks = CallbackRouter(
+    USER_CALLBACK_ACTIONS,
+    default=handle_user_selection,
+    legacy=dict.fromkeys(
+        ("user", "edit", "disable", "enable", "reset", "revoke", "delete", "hwid", "stats", "confirm"),
+        handle_user_action
+    ),
+    expired=handle_expired_callback,
+)
+
+# Ожидание ввода (например HWID): кнопка «Отмена» возвращает к карточке по токену
+waiting_input_callbacks = CallbackRouter(
+    USER_CALLBACK_ACTIONS,
+    default=handle_users_menu,
+    expired=handle_expired_callback,
+)
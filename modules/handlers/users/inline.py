@@ -0,0 +1,121 @@
+"""
+Inline-поиск пользователей (@bot alice) по локальному индексу и открытие карточки по ссылке
+"""
+import heapq
+import logging
+from collections import OrderedDict
+from typing import List, Tuple
+
+from telegram import (
+    InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent, Update
+)
+from telegram.ext import ContextTypes
+from telegram.helpers import create_deep_linked_url
+
+from modules.api.user_index import user_index
+from modules.api.user_mirror import user_mirror
+from modules.config import SEARCH_MIN_LENGTH
+from modules.localization import resolve_language, translate_text
+from modules.utils.auth import check_operator_or_admin, is_admin_user, is_authorized_user
+from modules.utils.formatters import format_bytes
+
+from .handlers import show_user_details
+
+logger = logging.getLogger(__name__)
+
+# Параметр /start для открытия карточки: u_<uuid> (Telegram допускает A-Z, a-z, 0-9, _ и -)
+USER_DEEP_LINK_PREFIX = "u_"
+# Больше 50 результатов Telegram не принимает
+INLINE_RESULTS_LIMIT = 50
+# Сколько последних запросов помнить; кэш сбрасывается при любом изменении пользователей
+INLINE_CACHE_SIZE = 256
+# Сколько секунд Telegram может сам кэшировать ответ (только для этого админа)
+INLINE_CACHE_TIME = 10
+
+_results_cache: "OrderedDict[Tuple[str, str], List[InlineQueryResultArticle]]" = OrderedDict()
+
+
+def _invalidate_results(upserted, removed):
+    """User mirror listener: any user change makes cached answers stale"""
+    if upserted or removed:
+        _results_cache.clear()
+
+
+user_mirror.add_listener(_invalidate_results, replay=False)
+
+
+def _rank(user, term: str) -> tuple:
+    """Exact username first, then username prefix matches, then the rest; alphabetical within each"""
+    username = (user.get('username') or '').lower()
+    return username != term, not username.startswith(term), username
+
+
+def _user_result(user, bot_username: str, language: str) -> InlineQueryResultArticle:
+    status_emoji = "✅" if user.get('status') == "ACTIVE" else "❌"
+    expire_at = str(user.get('expireAt') or '')[:10] or "—"
+    traffic = f"{format_bytes(user.get('usedTrafficBytes') or 0)}/{format_bytes(user.get('trafficLimitBytes') or 0)}"
+    details = [f"📊 {status_emoji} {user.get('status', '')}", f"📈 {traffic}", f"📅 {expire_at}"]
+    if user.get('tag'):
+        details.append(f"🏷️ {user['tag']}")
+
+    # Подписи без слов: текст одинаково читается на любом языке и уходит в чужие чаты как есть
+    message = "\n".join([f"👤 {user.get('username', '')}", f"🆔 {user.uuid}"] + details)
+    link = create_deep_linked_url(bot_username, f"{USER_DEEP_LINK_PREFIX}{user.uuid}")
+    return InlineQueryResultArticle(
+        id=user.uuid,
+        title=f"{status_emoji} {user.get('username', '')}",
+        description=" · ".join(details),
+        input_message_content=InputTextMessageContent(message),
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton(translate_text("👤 Открыть в боте", language), url=link)]
+        ]),
+    )
+
+
+async def _find_results(term: str, bot_username: str, language: str) -> List[InlineQueryResultArticle]:
+    key = (term, language)
+    cached = _results_cache.get(key)
+    if cached is not None:
+        _results_cache.move_to_end(key)
+        return cached
+
+    await user_mirror.ensure_loaded()
+    # Короткий запрос совпадает с тысячами пользователей: сортировать все незачем, нужны первые 50
+    users = heapq.nsmallest(
+        INLINE_RESULTS_LIMIT, user_mirror.lookup(user_index.search(term)), key=lambda user: _rank(user, term)
+    )
+    results = [_user_result(user, bot_username, language) for user in users]
+    _results_cache[key] = results
+    if len(_results_cache) > INLINE_CACHE_SIZE:
+        _results_cache.popitem(last=False)
+    return results
+
+
+async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer `@bot <term>` with matching users from the local index"""
+    query = update.inline_query
+    if not is_authorized_user(query.from_user.id):
+        # Посторонним не показываем ничего, даже факт отсутствия совпадений не кэшируем
+        await query.answer([], cache_time=0, is_personal=True)
+        return
+
+    term = query.query.strip().lower()
+    if len(term) < SEARCH_MIN_LENGTH:
+        await query.answer([], cache_time=0, is_personal=True)
+        return
+
+    language = resolve_language(query.from_user.id, None)
+    try:
+        results = await _find_results(term, context.bot.username, language)
+    except Exception as e:
+        logger.error(f"Inline search for '{term}' failed: {e}")
+        results = []
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+
+@check_operator_or_admin
+async def handle_user_deep_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/start u_<uuid> from an inline result: open the user card in the private chat"""
+    uuid = context.args[0][len(USER_DEEP_LINK_PREFIX):] if context.args else ""
+    context.user_data['is_admin'] = is_admin_user(update.effective_user.id)
+    return await show_user_details(update, context, uuid)
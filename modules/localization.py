@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 import json
+import logging
+import re
+from collections import OrderedDict
 from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Hashable, Iterable, Optional, Sequence, Tuple
 
 from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
+from modules.config import KEYBOARD_CACHE_SIZE, TRANSLATION_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
 DEFAULT_LANGUAGE = "ru"
 SUPPORTED_LANGUAGES: Dict[str, str] = {
     "ru": "Русский",
@@ -17,6 +25,21 @@ _LOCALES_DIR = Path(__file__).resolve().parent / "locales"
 _USER_LANGUAGE: Dict[int, str] = {}
 _CHAT_LANGUAGE: Dict[int, str] = {}
 
+# Большая часть текстов статична (заголовки меню, подписи кнопок), поэтому переводы кэшируются:
+# (язык, текст) -> перевод и (язык, структура клавиатуры) -> переведенные кнопки
+_TEXT_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_KEYBOARD_CACHE: "OrderedDict[Tuple[str, Hashable], InlineKeyboardMarkup]" = OrderedDict()
+translation_metrics: Dict[str, int] = {'text_hits': 0, 'text_misses': 0, 'keyboard_hits': 0, 'keyboard_misses': 0}
+
+# Как часто писать в лог долю попаданий в кэш (каждые N промахов)
+_METRICS_LOG_EVERY = 1000
+
+_BUTTON_FIELDS = (
+    "callback_data", "url", "switch_inline_query", "switch_inline_query_current_chat",
+    "callback_game", "pay", "login_url", "web_app",
+)
+_button_key = attrgetter("text", *_BUTTON_FIELDS)
+
 
 def remember_language(user_id: Optional[int], chat_id: Optional[int], language: str) -> None:
     if user_id is not None:
@@ -33,14 +56,48 @@ def resolve_language(user_id: Optional[int], chat_id: Optional[int]) -> str:
     return DEFAULT_LANGUAGE
 
 
+def _compile_keys(keys: Iterable[str]) -> "re.Pattern[str]":
+    """One regex for all keys, nested as a prefix tree so each position is checked once per prefix.
+
+    Longer continuations are tried before ending at a shorter key, so the match at every
+    position is the longest key that starts there.
+    """
+    trie: Dict[str, Any] = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = []
+        for char, child in node.items():
+            if not char:
+                continue
+            prefix = re.escape(char)
+            # Цепочки без ветвлений сворачиваем в литерал, чтобы не плодить группы
+            while len(child) == 1 and "" not in child:
+                (char, child), = child.items()
+                prefix += re.escape(char)
+            branches.append(prefix + build(child))
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + body + ")?"
+        return body
+
+    return re.compile(build(trie))
+
+
 @lru_cache()
 def _load_language_map(language: str) -> Dict[str, Any]:
     if language == DEFAULT_LANGUAGE:
-        return {"map": {}, "keys": ()}
+        return {"map": {}, "keys": (), "pattern": None}
 
     locale_file = _LOCALES_DIR / f"{language}.json"
     if not locale_file.exists():
-        return {"map": {}, "keys": ()}
+        return {"map": {}, "keys": (), "pattern": None}
 
     data = json.loads(locale_file.read_text(encoding="utf-8"))
 
@@ -55,7 +112,9 @@ def _load_language_map(language: str) -> Dict[str, Any]:
         sanitized_map[key] = value
 
     keys = tuple(sorted(sanitized_map.keys(), key=len, reverse=True))
-    return {"map": sanitized_map, "keys": keys}
+    # Все ключи ищутся за один проход по тексту вместо отдельного поиска каждого ключа
+    pattern = _compile_keys(keys) if keys else None
+    return {"map": sanitized_map, "keys": keys, "pattern": pattern}
 
 
 def translate_text(text: Optional[str], language: Optional[str] = None) -> Optional[str]:
@@ -67,13 +126,85 @@ def translate_text(text: Optional[str], language: Optional[str] = None) -> Optio
 
     lang_data = _load_language_map(language)
     result = str(text)
-    for key in lang_data["keys"]:
-        if key and key in result:
-            replacement = lang_data["map"].get(key)
-            if not isinstance(replacement, str):
-                continue
-            result = result.replace(key, replacement)
-    return result
+    pattern = lang_data["pattern"]
+    if pattern is None:
+        return result
+
+    cache_key = (language, result)
+    cached = _TEXT_CACHE.get(cache_key)
+    if cached is not None:
+        translation_metrics['text_hits'] += 1
+        _TEXT_CACHE.move_to_end(cache_key)
+        return cached
+    translation_metrics['text_misses'] += 1
+    if translation_metrics['text_misses'] % _METRICS_LOG_EVERY == 0:
+        stats = translation_cache_stats()
+        logger.info(
+            f"Translation cache: text hit ratio {stats['text_hit_ratio']:.0%} ({stats['text_cache_size']} cached), "
+            f"keyboard hit ratio {stats['keyboard_hit_ratio']:.0%} ({stats['keyboard_cache_size']} cached)"
+        )
+
+    translations = lang_data["map"]
+    translated = pattern.sub(lambda match: translations[match.group(0)], result)
+    _remember(_TEXT_CACHE, cache_key, translated, TRANSLATION_CACHE_SIZE)
+    return translated
+
+
+def _remember(cache: OrderedDict, key: Hashable, value: Any, size: int) -> None:
+    if size <= 0:
+        return
+    cache[key] = value
+    if len(cache) > size:
+        cache.popitem(last=False)
+
+
+def _keyboard_key(rows: Sequence[Sequence[InlineKeyboardButton]]) -> Optional[Hashable]:
+    """Structural key of a keyboard: texts and actions of all buttons; None if not hashable"""
+    key = tuple(tuple(map(_button_key, row)) for row in rows)
+    try:
+        hash(key)
+    except TypeError:
+        # callback_data может быть произвольным объектом (arbitrary callback data)
+        return None
+    return key
+
+
+def _translate_button(button: InlineKeyboardButton, language: str) -> InlineKeyboardButton:
+    kwargs = {field: getattr(button, field) for field in _BUTTON_FIELDS}
+    filtered_kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    return InlineKeyboardButton(translate_text(button.text, language), **filtered_kwargs)
+
+
+def _translate_rows(rows: Iterable[Iterable[InlineKeyboardButton]], language: str) -> InlineKeyboardMarkup:
+    """Translated keyboard; identical keyboards are translated once per language"""
+    rows = tuple(tuple(row) for row in rows)
+    key = _keyboard_key(rows)
+    if key is not None:
+        cached = _KEYBOARD_CACHE.get((language, key))
+        if cached is not None:
+            translation_metrics['keyboard_hits'] += 1
+            _KEYBOARD_CACHE.move_to_end((language, key))
+            return cached
+    translation_metrics['keyboard_misses'] += 1
+
+    translated = InlineKeyboardMarkup([[_translate_button(button, language) for button in row] for row in rows])
+    if key is not None:
+        _remember(_KEYBOARD_CACHE, (language, key), translated, KEYBOARD_CACHE_SIZE)
+    return translated
+
+
+def translation_cache_stats() -> Dict[str, Any]:
+    """Hit ratios and sizes of the text and keyboard translation caches"""
+    def ratio(hits: int, misses: int) -> float:
+        return hits / (hits + misses) if hits + misses else 0.0
+
+    return {
+        **translation_metrics,
+        'text_hit_ratio': ratio(translation_metrics['text_hits'], translation_metrics['text_misses']),
+        'keyboard_hit_ratio': ratio(translation_metrics['keyboard_hits'], translation_metrics['keyboard_misses']),
+        'text_cache_size': len(_TEXT_CACHE),
+        'keyboard_cache_size': len(_KEYBOARD_CACHE),
+    }
 
 
 def _translate_markup_for_language(
@@ -82,25 +213,7 @@ def _translate_markup_for_language(
     if markup is None or language == DEFAULT_LANGUAGE:
         return markup
 
-    new_keyboard = []
-    for row in markup.inline_keyboard:
-        new_row = []
-        for button in row:
-            kwargs = {
-                "callback_data": button.callback_data,
-                "url": button.url,
-                "switch_inline_query": button.switch_inline_query,
-                "switch_inline_query_current_chat": button.switch_inline_query_current_chat,
-                "callback_game": button.callback_game,
-                "pay": button.pay,
-                "login_url": button.login_url,
-                "web_app": button.web_app,
-            }
-            filtered_kwargs = {k: v for k, v in kwargs.items() if v is not None}
-            new_text = translate_text(button.text, language)
-            new_row.append(InlineKeyboardButton(new_text, **filtered_kwargs))
-        new_keyboard.append(new_row)
-    return InlineKeyboardMarkup(new_keyboard)
+    return _translate_rows(markup.inline_keyboard, language)
 
 
 def get_user_language(context: Optional[Any]) -> str:
@@ -169,25 +282,7 @@ def localize_keyboard(
     if language == DEFAULT_LANGUAGE:
         return keyboard
 
-    translated_rows = []
-    for row in keyboard:
-        translated_row = []
-        for button in row:
-            kwargs = {
-                "callback_data": button.callback_data,
-                "url": button.url,
-                "switch_inline_query": button.switch_inline_query,
-                "switch_inline_query_current_chat": button.switch_inline_query_current_chat,
-                "callback_game": button.callback_game,
-                "pay": button.pay,
-                "login_url": button.login_url,
-                "web_app": button.web_app,
-            }
-            filtered_kwargs = {k: v for k, v in kwargs.items() if v is not None}
-            new_text = translate_text(button.text, language)
-            translated_row.append(InlineKeyboardButton(new_text, **filtered_kwargs))
-        translated_rows.append(translated_row)
-    return translated_rows
+    return [list(row) for row in _translate_rows(keyboard, language).inline_keyboard]
 
 
 _original_reply_text = Message.reply_text
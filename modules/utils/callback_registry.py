@@ -0,0 +1,129 @@
+"""
+Короткие токены вместо UUID и HWID в callback_data и маршрутизация нажатий по ним
+"""
+import logging
+import secrets
+import string
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from modules.config import CALLBACK_REGISTRY_SIZE, CALLBACK_TOKEN_TTL
+
+logger = logging.getLogger(__name__)
+
+# Токены начинаются с символа, который не встречается в обычных callback_data бота
+TOKEN_PREFIX = "~"
+TOKEN_LENGTH = 8
+# Без "_": часть обработчиков режет callback_data по подчеркиванию
+_TOKEN_ALPHABET = string.ascii_letters + string.digits
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class CallbackAction(NamedTuple):
+    action: str
+    args: Tuple[str, ...]
+
+
+def is_token(data: Any) -> bool:
+    return isinstance(data, str) and data.startswith(TOKEN_PREFIX)
+
+
+class CallbackRegistry:
+    """Maps short opaque tokens to (action, args) payloads with TTL and size-bounded eviction.
+
+    Telegram limits callback data to 64 bytes; a token is 9 bytes whatever the payload.
+    The same payload gets the same token while it lives, so a re-rendered keyboard stays
+    identical. Tokens are kept in memory only: after a restart old buttons report "expired".
+    """
+
+    def __init__(self, ttl: float = CALLBACK_TOKEN_TTL, max_size: int = CALLBACK_REGISTRY_SIZE):
+        self._ttl = ttl
+        self._max_size = max_size
+        # token -> (payload, срок действия); порядок — от давно использованных к недавним
+        self._entries: "OrderedDict[str, Tuple[CallbackAction, float]]" = OrderedDict()
+        self._tokens: Dict[CallbackAction, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _new_token(self) -> str:
+        while True:
+            token = TOKEN_PREFIX + "".join(secrets.choice(_TOKEN_ALPHABET) for _ in range(TOKEN_LENGTH))
+            if token not in self._entries:
+                return token
+
+    def _evict(self, now: float):
+        # Срок действия продлевается при каждом обращении, поэтому в начале всегда самые старые записи
+        while self._entries:
+            token, (payload, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) <= self._max_size:
+                break
+            del self._entries[token]
+            if self._tokens.get(payload) == token:
+                del self._tokens[payload]
+
+    def token(self, action: str, *args: Any) -> str:
+        """callback_data for an action with its arguments"""
+        payload = CallbackAction(action, tuple(str(arg) for arg in args))
+        now = time.monotonic()
+        token = self._tokens.get(payload)
+        if token is None:
+            token = self._new_token()
+            self._tokens[payload] = token
+        self._entries[token] = (payload, now + self._ttl)
+        self._entries.move_to_end(token)
+        self._evict(now)
+        return token
+
+    def resolve(self, data: Any) -> Optional[CallbackAction]:
+        """Payload of a token; None for unknown or expired tokens and for plain callback data"""
+        if not is_token(data):
+            return None
+        entry = self._entries.get(data)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self._evict(now)
+            return None
+        self._entries[data] = (payload, now + self._ttl)
+        self._entries.move_to_end(data)
+        return payload
+
+
+callback_registry = CallbackRegistry()
+
+
+class CallbackRouter:
+    """Single CallbackQueryHandler callback for a conversation state.
+
+    Tokens are dispatched by their action through the `actions` table, handlers get the
+    token arguments after (update, context). Plain callback data is looked up by its first
+    "_"-separated word in `legacy`, anything else goes to `default`.
+    """
+
+    def __init__(self, actions: Dict[str, Handler], default: Handler,
+                 legacy: Optional[Dict[str, Handler]] = None, expired: Optional[Handler] = None):
+        self.actions = actions
+        self.default = default
+        self.legacy = legacy or {}
+        self.expired = expired or default
+
+    async def __call__(self, update, context):
+        data = update.callback_query.data if update.callback_query else None
+        if is_token(data):
+            entry = callback_registry.resolve(data)
+            if entry is None:
+                logger.debug(f"Expired callback token {data}")
+                return await self.expired(update, context)
+            handler = self.actions.get(entry.action)
+            if handler is None:
+                logger.warning(f"No handler for callback action {entry.action}")
+                return await self.default(update, context)
+            return await handler(update, context, *entry.args)
+
+        word = data.split("_", 1)[0] if isinstance(data, str) else None
+        return await self.legacy.get(word, self.default)(update, context)
@@ -3,6 +3,8 @@ from datetime import datetime
 import logging
 from datetime import datetime
 
+from telegram.error import RetryAfter
+
 logger = logging.getLogger(__name__)
 
 async def safe_edit_message(query, text, reply_markup=None, parse_mode=None):
@@ -24,6 +26,10 @@ async def safe_edit_message(query, text, reply_markup=None, parse_mode=None):
             except Exception:
                 pass  # Ignore if callback already answered
             return True
+        elif isinstance(e, RetryAfter):
+            # Планировщик исходящих запросов уже исчерпал повторы
+            logger.warning(f"Message edit dropped by Telegram flood control: {e}")
+            return False
         else:
             # Другая ошибка, логируем ее
             logger.error(f"Error editing message: {e}")
@@ -0,0 +1,255 @@
+"""
+Планировщик исходящих запросов к Telegram: лимиты на чат и на бота, склейка правок,
+пропуск правок без изменений, RetryAfter
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Tuple, Union
+
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from modules.config import OUTBOUND_CHAT_RATE, OUTBOUND_GLOBAL_RATE, OUTBOUND_RETRY_ATTEMPTS
+from modules.utils.update_processor import current_update
+
+logger = logging.getLogger(__name__)
+
+# Группы: не больше 20 сообщений в минуту
+GROUP_CHAT_RATE = 20 / 60
+# Сколько запросов в чат можно отправить подряд, прежде чем включится ограничение
+CHAT_BURST = 3
+# Правки, которые можно склеивать: в очереди важен только последний вариант сообщения
+MERGEABLE_ENDPOINTS = {"editMessageText", "editMessageReplyMarkup", "editMessageCaption"}
+
+# Сколько последних сообщений и ответов на callback помнить
+CONTENT_CACHE_SIZE = 4096
+
+# Счетчики для диагностики
+outbound_metrics: Dict[str, int] = {'sent': 0, 'merged_edits': 0, 'unchanged_edits': 0, 'retry_after': 0}
+
+
+def _digest(value: Any) -> str:
+    if value is None:
+        return ''
+    if hasattr(value, 'to_json'):
+        payload = value.to_json()
+    elif isinstance(value, (list, tuple)):
+        payload = json.dumps([item.to_dict() if hasattr(item, 'to_dict') else item for item in value], default=str)
+    else:
+        payload = str(value)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _content_digests(endpoint: str, data: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    """(text digest, markup digest) of an edit; text digest is None for markup-only edits"""
+    markup = _digest(data.get('reply_markup'))
+    if endpoint == "editMessageReplyMarkup":
+        return None, markup
+    text = data.get('text') if endpoint == "editMessageText" else data.get('caption')
+    entities = data.get('entities') if endpoint == "editMessageText" else data.get('caption_entities')
+    parts = (text, data.get('parse_mode'), _digest(entities), data.get('disable_web_page_preview'))
+    return _digest(json.dumps(parts, default=str)), markup
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` stored"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "bucket")
+
+    def __init__(self, rate: float):
+        self.lock = asyncio.Lock()
+        self.bucket = TokenBucket(rate, CHAT_BURST)
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Throttles Bot API calls per chat and globally, in order within a chat.
+
+    Consecutive edits of the same message are merged: an edit still waiting in the
+    chat queue when a newer one arrives is dropped. Edits whose text and markup
+    match what the message already shows are not sent at all. RetryAfter is
+    honoured by pausing (the chat, or the whole bot for chat-less calls) and retrying.
+    """
+
+    def __init__(self, global_rate: float = OUTBOUND_GLOBAL_RATE, chat_rate: float = OUTBOUND_CHAT_RATE,
+                 retry_attempts: int = OUTBOUND_RETRY_ATTEMPTS):
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._retry_attempts = retry_attempts
+        self._chats: Dict[Hashable, _ChatQueue] = {}
+        # (endpoint, chat, message) -> номер последней поставленной в очередь правки
+        self._edit_generations: Dict[tuple, int] = {}
+        self._paused_until = 0.0
+        # (chat, message) -> (хэш текста, хэш клавиатуры), последнее отправленное содержимое
+        self._contents: "OrderedDict[tuple, Tuple[Optional[str], str]]" = OrderedDict()
+        # Callback-запросы, на которые уже отправлен ответ
+        self._answered: "OrderedDict[str, None]" = OrderedDict()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+        self._edit_generations.clear()
+        self._contents.clear()
+        self._answered.clear()
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: Hashable, value: Any):
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > CONTENT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _is_unchanged(self, message_key: tuple, digests: Tuple[Optional[str], str]) -> bool:
+        previous = self._contents.get(message_key)
+        if previous is None:
+            return False
+        text, markup = digests
+        return markup == previous[1] and (text is None or text == previous[0])
+
+    def _store_content(self, message_key: tuple, digests: Tuple[Optional[str], str]):
+        text, markup = digests
+        if text is None:
+            previous = self._contents.get(message_key)
+            text = previous[0] if previous else None
+        self._remember(self._contents, message_key, (text, markup))
+
+    async def _answer_current_callback(self):
+        """Answer the callback that triggered a skipped edit, unless the handler already did"""
+        update = current_update.get()
+        query = update.callback_query if update is not None else None
+        if query is None or query.id in self._answered:
+            return
+        try:
+            await query.answer()
+        except Exception as e:
+            logger.debug(f"Callback answer for unchanged edit failed: {e}")
+
+    def _chat_queue(self, chat_id: Hashable) -> _ChatQueue:
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            queue = self._chats[chat_id] = _ChatQueue(GROUP_CHAT_RATE if is_group else self._chat_rate)
+        return queue
+
+    async def _wait_global_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _call(self, callback, args, kwargs, endpoint: str, chat_id: Optional[Hashable],
+                    superseded: Callable[[], bool]):
+        attempt = 0
+        while True:
+            await self._wait_global_pause()
+            try:
+                result = await callback(*args, **kwargs)
+                outbound_metrics['sent'] += 1
+                return result
+            except RetryAfter as e:
+                outbound_metrics['retry_after'] += 1
+                attempt += 1
+                if attempt > self._retry_attempts:
+                    raise
+                delay = float(e.retry_after)
+                logger.warning(f"Telegram flood control on {endpoint} (chat {chat_id}): retry in {delay:.0f}s")
+                if chat_id is None:
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                else:
+                    # Очередь чата стоит, пока не истечет пауза; остальные чаты продолжают работать
+                    await asyncio.sleep(delay)
+                if superseded():
+                    outbound_metrics['merged_edits'] += 1
+                    return True
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Any],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            if endpoint == "answerCallbackQuery" and data.get("callback_query_id"):
+                self._remember(self._answered, str(data["callback_query_id"]), None)
+            # Ответы на callback/inline-запросы и служебные вызовы не ставим в очередь чата
+            return await self._call(callback, args, kwargs, endpoint, None, lambda: False)
+
+        edit_key = message_key = digests = None
+        generation = 0
+        if endpoint in MERGEABLE_ENDPOINTS and data.get("message_id") is not None:
+            message_key = (chat_id, data["message_id"])
+            digests = _content_digests(endpoint, data)
+            edit_key = (endpoint, chat_id, data["message_id"])
+            generation = self._edit_generations.get(edit_key, 0) + 1
+            self._edit_generations[edit_key] = generation
+        elif endpoint == "sendMessage":
+            digests = _content_digests("editMessageText", data)
+
+        def superseded() -> bool:
+            return edit_key is not None and self._edit_generations.get(edit_key) != generation
+
+        queue = self._chat_queue(chat_id)
+        try:
+            async with queue.lock:
+                if superseded():
+                    # Пока правка ждала очереди, пришла более новая для того же сообщения
+                    outbound_metrics['merged_edits'] += 1
+                    return True
+                if message_key is not None and self._is_unchanged(message_key, digests):
+                    # Содержимое не изменилось — не тратим запрос, только убираем «часики» у кнопки
+                    outbound_metrics['unchanged_edits'] += 1
+                    await self._answer_current_callback()
+                    return True
+                await queue.bucket.acquire()
+                await self._global.acquire()
+                try:
+                    result = await self._call(callback, args, kwargs, endpoint, chat_id, superseded)
+                except BadRequest as e:
+                    if message_key is not None:
+                        if "not modified" in str(e).lower():
+                            self._store_content(message_key, digests)
+                        else:
+                            self._contents.pop(message_key, None)
+                    raise
+                except Exception:
+                    if message_key is not None:
+                        self._contents.pop(message_key, None)
+                    raise
+                if message_key is None and digests is not None and isinstance(result, dict):
+                    # Новое сообщение: запоминаем содержимое, чтобы первая же пустая правка не ушла в API
+                    message_key = (chat_id, result.get("message_id"))
+                if message_key is not None and not superseded():
+                    self._store_content(message_key, digests)
+                return result
+        finally:
+            if edit_key is not None and self._edit_generations.get(edit_key) == generation:
+                del self._edit_generations[edit_key]
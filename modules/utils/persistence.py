@@ -0,0 +1,261 @@
+"""
+Сохранение состояния диалогов и user_data в SQLite, чтобы перезапуск не обрывал мастера
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from modules.config import PERSISTENCE_FLUSH_DELAY, PERSISTENCE_INTERVAL, PERSISTENCE_PATH
+from modules.localization import remember_language
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (user_id, key)
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+);
+"""
+
+# Ключи user_data, которые не сохраняются: большие кэши списков (их можно загрузить заново)
+# и права доступа (после перезапуска роль всегда определяется по текущей конфигурации)
+EXCLUDED_USER_DATA_KEYS = frozenset({
+    "users", "users_data", "nodes_data", "full_inbounds",
+    "is_admin", "role",
+})
+
+
+class UserData(dict):
+    """user_data whose deep copy leaves out EXCLUDED_USER_DATA_KEYS.
+
+    PTB deep-copies user_data of every active admin before handing it to the persistence;
+    skipping cached lists here keeps that copy as cheap as the data actually stored.
+    """
+
+    def __deepcopy__(self, memo):
+        return UserData({
+            key: copy.deepcopy(value, memo) for key, value in self.items() if key not in EXCLUDED_USER_DATA_KEYS
+        })
+
+
+class SQLitePersistence(BasePersistence[UserData, Dict[Any, Any], Dict[Any, Any]]):
+    """Conversation states and user_data in SQLite.
+
+    Only keys whose serialized value changed since the last write are stored; changes are
+    collected and written in one transaction PERSISTENCE_FLUSH_DELAY seconds after the first one.
+    """
+
+    def __init__(self, path: str = PERSISTENCE_PATH, update_interval: float = PERSISTENCE_INTERVAL,
+                 flush_delay: float = PERSISTENCE_FLUSH_DELAY):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self._flush_delay = flush_delay
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        # Хэши последних записанных значений: (user_id, key) -> sha1, (name, key) -> состояние
+        self._user_digests: Dict[int, Dict[str, str]] = {}
+        self._conversations: Dict[str, Dict[Tuple, object]] = {}
+        # Ожидающие записи: ('user', user_id, key) / ('conversation', name, key) -> значение или None (удалить)
+        self._pending: Dict[tuple, Any] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _run(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        return conn
+
+    async def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = await self._run(self._open)
+            logger.info(f"State persistence opened: {self.path}")
+        return self._conn
+
+    # --- загрузка ---
+
+    def _read_user_data(self):
+        return self._conn.execute("SELECT user_id, key, value FROM user_data").fetchall()
+
+    async def get_user_data(self) -> Dict[int, UserData]:
+        await self._connection()
+        result: Dict[int, UserData] = {}
+        for user_id, key, value in await self._run(self._read_user_data):
+            try:
+                result.setdefault(user_id, UserData())[key] = pickle.loads(value)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable user_data {user_id}/{key}: {e}")
+                continue
+            self._user_digests.setdefault(user_id, {})[key] = hashlib.sha1(value).hexdigest()
+
+        for user_id, data in result.items():
+            if data.get("language"):
+                remember_language(user_id, None, data["language"])
+        logger.info(f"Restored user_data of {len(result)} users")
+        return result
+
+    def _read_conversations(self, name: str):
+        return self._conn.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        await self._connection()
+        conversations = {}
+        for key, state in await self._run(self._read_conversations, name):
+            conversations[tuple(json.loads(key))] = json.loads(state)
+        self._conversations[name] = dict(conversations)
+        logger.info(f"Restored {len(conversations)} conversations of {name}")
+        return conversations
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    # --- изменения ---
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self._flush_delay)
+        await self._write_pending()
+
+    async def update_user_data(self, user_id: int, data: UserData) -> None:
+        written = self._user_digests.setdefault(user_id, {})
+        for key, value in data.items():
+            if key in EXCLUDED_USER_DATA_KEYS or not isinstance(key, str):
+                continue
+            try:
+                blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logger.debug(f"user_data[{key!r}] of {user_id} is not serializable, not persisted: {e}")
+                continue
+            digest = hashlib.sha1(blob).hexdigest()
+            if written.get(key) != digest:
+                written[key] = digest
+                self._pending[("user", user_id, key)] = blob
+        for key in [key for key in written if key not in data or key in EXCLUDED_USER_DATA_KEYS]:
+            del written[key]
+            self._pending[("user", user_id, key)] = None
+        if self._pending:
+            self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        for key in self._user_digests.pop(user_id, {}):
+            self._pending[("user", user_id, key)] = None
+        self._schedule_flush()
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        states = self._conversations.setdefault(name, {})
+        if states.get(key) == new_state:
+            return
+        if new_state is None:
+            states.pop(key, None)
+        else:
+            states[key] = new_state
+        self._pending[("conversation", name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: UserData) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    # --- запись ---
+
+    def _write(self, changes: Dict[tuple, Any]):
+        with self._conn:
+            for (kind, owner, key), value in changes.items():
+                if kind == "user":
+                    if value is None:
+                        self._conn.execute("DELETE FROM user_data WHERE user_id = ? AND key = ?", (owner, key))
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO user_data (user_id, key, value) VALUES (?, ?, ?)",
+                            (owner, key, value)
+                        )
+                elif value is None:
+                    self._conn.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (owner, key))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                        (owner, key, json.dumps(value))
+                    )
+
+    async def _write_pending(self):
+        if not self._pending:
+            return
+        changes, self._pending = self._pending, {}
+        try:
+            await self._connection()
+            await self._run(self._write, changes)
+            logger.debug(f"State persistence: saved {len(changes)} changes")
+        except Exception as e:
+            logger.error(f"Error writing state persistence: {e}")
+            # Вернем изменения в очередь, не затирая более свежие
+            changes.update(self._pending)
+            self._pending = changes
+
+    async def flush(self) -> None:
+        """Write everything still pending and close the database (called by PTB on shutdown)"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self._write_pending()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await self._run(conn.close)
+
+
+def create_persistence() -> Optional[SQLitePersistence]:
+    """Persistence backend if PERSISTENCE_PATH is configured"""
+    if not PERSISTENCE_PATH:
+        return None
+    return SQLitePersistence(PERSISTENCE_PATH)
@@ -7,8 +7,10 @@ from typing import List, Dict, Optional, Tuple
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from modules.api.users import UserAPI
+from modules.api.user_mirror import user_mirror
 from modules.api.inbounds import InboundAPI
 from modules.api.nodes import NodeAPI
+from modules.utils.callback_registry import callback_registry
 from modules.utils.formatters import escape_markdown
 
 logger = logging.getLogger(__name__)
@@ -29,14 +31,13 @@ class SelectionHelper:
         Returns: (keyboard, users_data)
         """
         try:
-            response = await UserAPI.get_all_users()
-            if not response or not response.get("users"):
+            users = await user_mirror.get_users()
+            if not users:
                 keyboard = []
                 if include_back:
                     keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="back")])
                 return InlineKeyboardMarkup(keyboard), {}
             
-            users = response["users"]
             total_users = len(users)
             total_pages = (total_users + per_page - 1) // per_page
             
@@ -52,7 +53,7 @@ class SelectionHelper:
                 status_emoji = "✅" if user["status"] == "ACTIVE" else "❌"
                 display_name = f"{status_emoji} {user['username']}"
                 
-                callback_data = f"{callback_prefix}_{user['uuid']}"
+                callback_data = callback_registry.token(callback_prefix, user['uuid'])
                 users_data[user['uuid']] = user
                 
                 keyboard.append([InlineKeyboardButton(display_name, callback_data=callback_data)])
@@ -197,23 +198,23 @@ class SelectionHelper:
         if is_admin:
             rows.extend([
                 [
-                    InlineKeyboardButton("✏️ Редактировать", callback_data=f"{action_prefix}_edit_{user_uuid}"),
-                    InlineKeyboardButton("🔄 Обновить данные", callback_data=f"{action_prefix}_refresh_{user_uuid}")
+                    InlineKeyboardButton("✏️ Редактировать", callback_data=callback_registry.token(f"{action_prefix}_edit", user_uuid)),
+                    InlineKeyboardButton("🔄 Обновить данные", callback_data=callback_registry.token(f"{action_prefix}_refresh", user_uuid))
                 ],
                 [
-                    InlineKeyboardButton("🚫 Отключить", callback_data=f"{action_prefix}_disable_{user_uuid}"),
-                    InlineKeyboardButton("✅ Включить", callback_data=f"{action_prefix}_enable_{user_uuid}")
+                    InlineKeyboardButton("🚫 Отключить", callback_data=callback_registry.token(f"{action_prefix}_disable", user_uuid)),
+                    InlineKeyboardButton("✅ Включить", callback_data=callback_registry.token(f"{action_prefix}_enable", user_uuid))
                 ],
                 [
-                    InlineKeyboardButton("📊 Сбросить трафик", callback_data=f"{action_prefix}_reset_traffic_{user_uuid}"),
-                    InlineKeyboardButton("🔐 Отозвать подписку", callback_data=f"{action_prefix}_revoke_{user_uuid}")
+                    InlineKeyboardButton("📊 Сбросить трафик", callback_data=callback_registry.token(f"{action_prefix}_reset_traffic", user_uuid)),
+                    InlineKeyboardButton("🔐 Отозвать подписку", callback_data=callback_registry.token(f"{action_prefix}_revoke", user_uuid))
                 ],
                 [
-                    InlineKeyboardButton("🗑️ Удалить", callback_data=f"{action_prefix}_delete_{user_uuid}")
+                    InlineKeyboardButton("🗑️ Удалить", callback_data=callback_registry.token(f"{action_prefix}_delete", user_uuid))
                 ]
             ])
         else:
-            rows.append([InlineKeyboardButton("🔄 Обновить данные", callback_data=f"{action_prefix}_refresh_{user_uuid}")])
+            rows.append([InlineKeyboardButton("🔄 Обновить данные", callback_data=callback_registry.token(f"{action_prefix}_refresh", user_uuid))])
 
         rows.append([InlineKeyboardButton("🔙 Назад к списку", callback_data="back_to_users")])
         return InlineKeyboardMarkup(rows)
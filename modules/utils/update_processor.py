@@ -0,0 +1,84 @@
+"""
+Параллельная обработка обновлений с последовательной обработкой внутри одного чата
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Обновление, которое сейчас обрабатывается в этой задаче (нужно слою исходящих запросов)
+current_update: ContextVar[Optional[Update]] = ContextVar("current_update", default=None)
+
+# Когда пришло последнее обновление от Telegram: фоновые задачи не нагружают панель, пока ботом не пользуются
+_last_update_at = time.monotonic()
+
+
+def seconds_since_last_update() -> float:
+    """Seconds since the bot last received an update (since start if none yet)"""
+    return time.monotonic() - _last_update_at
+
+
+def bot_is_idle(timeout: int) -> bool:
+    """True if nobody has used the bot for longer than timeout seconds (0 disables the check)"""
+    return timeout > 0 and seconds_since_last_update() > timeout
+
+
+def _update_key(update: object) -> Optional[int]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different chats concurrently, updates of one chat strictly in order.
+
+    ConversationHandler expects its updates one by one; a per-chat lock keeps each
+    admin's conversation state consistent while other admins are served in parallel.
+    """
+
+    __slots__ = ("_locks", "_waiting")
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # Сколько обновлений чата держат или ждут его замок
+        self._waiting: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        global _last_update_at
+        if isinstance(update, Update):
+            current_update.set(update)
+            _last_update_at = time.monotonic()
+        key = _update_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                await coroutine
+        finally:
+            # Удаляем замок чата, когда его больше никто не ждет
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._locks.clear()
+        self._waiting.clear()
@@ -0,0 +1,134 @@
+"""
+Бенчмарк перевода: прежний цикл по всем ключам против скомпилированного выражения и кэшей
+
+Запуск из корня репозитория:
+    python scripts/benchmark_translation.py [--language en] [--rounds 200]
+"""
+import argparse
+import ast
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+from modules import localization  # noqa: E402
+from modules.localization import _load_language_map, translate_text, translation_cache_stats  # noqa: E402
+
+
+def legacy_translate(text: str, language: str) -> str:
+    """The previous implementation: `in` + `replace` for every key, longest first"""
+    lang_data = _load_language_map(language)
+    result = str(text)
+    for key in lang_data["keys"]:
+        if key and key in result:
+            result = result.replace(key, lang_data["map"][key])
+    return result
+
+
+def uncached_translate(text: str, language: str) -> str:
+    """The compiled matcher alone, with the text cache emptied before every call"""
+    localization._TEXT_CACHE.clear()
+    return translate_text(text, language)
+
+
+def legacy_markup(markup: InlineKeyboardMarkup, language: str) -> InlineKeyboardMarkup:
+    """The previous keyboard translation: every button rebuilt and re-translated on each render"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(legacy_translate(button.text, language), callback_data=button.callback_data)
+         for button in row]
+        for row in markup.inline_keyboard
+    ])
+
+
+def collect_corpus() -> List[str]:
+    """String literals of the bot (f-string placeholders replaced with X): what the bot really sends"""
+    corpus = set()
+    for path in (ROOT / "modules").rglob("*.py"):
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.strip():
+                corpus.add(node.value)
+            elif isinstance(node, ast.JoinedStr):
+                corpus.add("".join(
+                    part.value if isinstance(part, ast.Constant) else "X" for part in node.values
+                ))
+    return sorted(corpus)
+
+
+def sample_messages(language: str) -> List[str]:
+    """A long menu text and a 50-button keyboard built from real locale keys"""
+    keys = [key for key in _load_language_map(language)["keys"] if "\n" not in key]
+    menu = "\n".join(f"{index}. {key} `value-{index}`" for index, key in enumerate(keys[:60]))
+    buttons = [f"🔘 {key}" for key in keys[-50:]]
+    return [menu] + buttons
+
+
+def measure(func: Callable[[str, str], str], texts: List[str], language: str, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            func(text, language)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    lang_data = _load_language_map(args.language)
+    if not lang_data["keys"]:
+        sys.exit(f"Нет словаря для языка {args.language}")
+
+    corpus = collect_corpus()
+    mismatches = [
+        text for text in corpus if uncached_translate(text, args.language) != legacy_translate(text, args.language)
+    ]
+    print(f"Keys: {len(lang_data['keys'])}, corpus: {len(corpus)} strings, differing results: {len(mismatches)}")
+    for text in mismatches:
+        print(f"  {text[:60]!r}")
+        print(f"    legacy:   {legacy_translate(text, args.language)[:80]!r}")
+        print(f"    compiled: {translate_text(text, args.language)[:80]!r}")
+
+    for title, texts, rounds in (
+        ("corpus", corpus, max(1, args.rounds // 20)),
+        ("menu + 50 buttons", sample_messages(args.language), args.rounds),
+    ):
+        legacy = measure(legacy_translate, texts, args.language, rounds)
+        compiled = measure(uncached_translate, texts, args.language, rounds)
+        cached = measure(translate_text, texts, args.language, rounds)
+        calls = len(texts) * rounds
+        print(
+            f"{title}: {calls} calls, legacy {legacy * 1e6 / calls:.1f} µs/call, "
+            f"compiled {compiled * 1e6 / calls:.1f} µs/call (x{legacy / compiled:.1f}), "
+            f"cached {cached * 1e6 / calls:.1f} µs/call (x{legacy / cached:.1f})"
+        )
+
+    buttons = sample_messages(args.language)[1:]
+    markup = InlineKeyboardMarkup([
+        [InlineKeyboardButton(text, callback_data=f"action_{index}")] for index, text in enumerate(buttons)
+    ])
+    legacy = measure(lambda _, language: legacy_markup(markup, language), [""], args.language, args.rounds)
+    cached = measure(
+        lambda _, language: localization._translate_markup_for_language(markup, language), [""], args.language, args.rounds
+    )
+    print(
+        f"keyboard of {len(buttons)} buttons: {args.rounds} renders, legacy {legacy * 1e6 / args.rounds:.1f} µs, "
+        f"cached {cached * 1e6 / args.rounds:.1f} µs (x{legacy / cached:.1f})"
+    )
+
+    stats = translation_cache_stats()
+    print(
+        f"Cache: text hit ratio {stats['text_hit_ratio']:.1%} ({stats['text_cache_size']} entries), "
+        f"keyboard hit ratio {stats['keyboard_hit_ratio']:.1%} ({stats['keyboard_cache_size']} entries)"
+    )
+
+
+if __name__ == "__main__":
+    main()